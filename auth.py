@@ -3,39 +3,246 @@ Authentication Manager Module
 Handles user authentication with Supabase
 """
 
+import base64
+import hashlib
+import hmac
+import json
+import random
+import re
+import time
+import httpx
+import jwt
 import streamlit as st
-from supabase import create_client, Client
-from typing import Optional
+import streamlit.components.v1 as components
+from supabase import create_client, Client, ClientOptions, AuthRetryableError
+from typing import Callable, Optional, Tuple, TypeVar
+
+T = TypeVar("T")
+
+# Read once at import; missing secrets surface as a connection error below
+try:
+    _SUPABASE_URL = st.secrets["supabase_url"]
+    _SUPABASE_KEY = st.secrets["supabase_key"]
+except Exception:
+    _SUPABASE_URL = None
+    _SUPABASE_KEY = None
+
+# Optional: without a cookie secret, logins are not remembered across refreshes
+try:
+    _COOKIE_SECRET = st.secrets["cookie_secret"]
+except Exception:
+    _COOKIE_SECRET = None
+
+# Optional: verifies tokens from projects still signing with the legacy shared
+# secret (HS256); asymmetric keys are checked against the project's JWKS
+try:
+    _SUPABASE_JWT_SECRET = st.secrets["supabase_jwt_secret"]
+except Exception:
+    _SUPABASE_JWT_SECRET = None
+
+# Asymmetric signing algorithms Supabase issues access tokens with
+_JWKS_ALGORITHMS = ("RS256", "ES256")
+
+_EMAIL_RE = re.compile(r"^[^@\s]+@[^@\s]+\.[^@\s]+$")
+_MIN_PASSWORD_LENGTH = 6  # Supabase's default minimum
+
+# Session state for a signed-out user; the keys stay present because other
+# modules read st.session_state.user directly
+_SIGNED_OUT_STATE = {
+    "user": None,
+    "user_email": None,
+    "access_token": None,
+    "refresh_token": None,
+}
+
+# Sidebar labels and widget keys, built once rather than on every rerun
+_AUTH_TABS = ("Login", "Sign Up")
+_GREETING = "Logged in as: {}"
+_LOGIN_FORM_KEY = "login_form"
+_LOGIN_EMAIL_KEY = "login_email"
+_LOGIN_PASSWORD_KEY = "login_password"
+_SIGNUP_FORM_KEY = "signup_form"
+_SIGNUP_EMAIL_KEY = "signup_email"
+_SIGNUP_PASSWORD_KEY = "signup_password"
+_SIGNUP_CONFIRM_KEY = "signup_password_confirm"
+
+_SESSION_COOKIE = "recipe_app_session"
+_SESSION_COOKIE_MAX_AGE = 60 * 60 * 24 * 30  # 30 days
+
+
+def _sign_cookie_value(value: str) -> str:
+    """Return the HMAC-SHA256 signature for a session cookie value"""
+    return hmac.new(_COOKIE_SECRET.encode(), value.encode(), hashlib.sha256).hexdigest()
+
+
+def _read_session_cookie() -> Optional[Tuple[str, str]]:
+    """
+    Read the (access_token, refresh_token) pair from the signed session cookie
+
+    Returns:
+        The token pair, or None if the cookie is missing or has been tampered with
+    """
+    if not _COOKIE_SECRET:
+        return None
+    raw = st.context.cookies.get(_SESSION_COOKIE)
+    if not raw:
+        return None
+    try:
+        access_token, refresh_token, signature = raw.split("|")
+    except ValueError:
+        return None
+    expected = _sign_cookie_value(f"{access_token}|{refresh_token}")
+    if not hmac.compare_digest(signature, expected):
+        return None
+    return access_token, refresh_token
+
+
+def _decode_jwt_claims(token: str) -> dict:
+    """Decode the payload of a JWT issued by Supabase (no signature check)"""
+    try:
+        payload = token.split(".")[1]
+        payload += "=" * (-len(payload) % 4)
+        return json.loads(base64.urlsafe_b64decode(payload))
+    except Exception:
+        return {}
+
+
+@st.cache_resource
+def _get_jwks_client() -> Optional[jwt.PyJWKClient]:
+    """Get the client for the project's signing keys (fetched lazily, then cached)"""
+    if not _SUPABASE_URL:
+        return None
+    return jwt.PyJWKClient(f"{_SUPABASE_URL}/auth/v1/.well-known/jwks.json", timeout=10)
+
+
+def _verify_jwt(token: str) -> Optional[dict]:
+    """
+    Verify a Supabase access token, returning its claims
+
+    Asymmetrically signed tokens are checked against the project's JWKS;
+    HS256 tokens against the JWT secret, when it is set.
+
+    Returns:
+        The claims, or None if the token can't be checked locally (HS256
+        without the secret, or the JWKS endpoint is unreachable)
+
+    Raises:
+        jwt.InvalidTokenError: The token is malformed, expired or not signed by this project
+    """
+    algorithm = jwt.get_unverified_header(token).get("alg")
+    if algorithm == "HS256":
+        if not _SUPABASE_JWT_SECRET:
+            return None
+        key = _SUPABASE_JWT_SECRET
+    elif algorithm in _JWKS_ALGORITHMS:
+        jwks_client = _get_jwks_client()
+        if jwks_client is None:
+            return None
+        try:
+            key = jwks_client.get_signing_key_from_jwt(token).key
+        except jwt.PyJWKClientConnectionError:
+            return None
+        except jwt.PyJWKClientError as e:
+            # No key in the project's set matches the token's key id
+            raise jwt.InvalidTokenError(str(e)) from e
+    else:
+        raise jwt.InvalidAlgorithmError(f"Unexpected signing algorithm: {algorithm}")
+    return jwt.decode(token, key, algorithms=[algorithm], audience="authenticated")
+
+
+def _token_claims(token: str) -> dict:
+    """Get the claims of an access token, checking its signature when possible"""
+    try:
+        claims = _verify_jwt(token)
+    except jwt.InvalidTokenError:
+        return {}
+    return _decode_jwt_claims(token) if claims is None else claims
+
+
+@st.cache_resource
+def _get_http_client() -> httpx.Client:
+    """
+    Get the pooled HTTP client shared by every session's Supabase client
+
+    Auth headers are sent per request by supabase-py, so sharing the
+    connection pool does not share any user's session.
+    """
+    # Retries are left to _retry, for idempotent calls only
+    transport = httpx.HTTPTransport(
+        http2=True,
+        limits=httpx.Limits(max_connections=60, max_keepalive_connections=40, keepalive_expiry=60),
+    )
+    return httpx.Client(
+        transport=transport,
+        timeout=httpx.Timeout(10.0),
+        follow_redirects=True,
+    )
+
+
+def _retry(fn: Callable[..., T], *args, max_retries: int = 3, base: float = 0.2, **kwargs) -> T:
+    """
+    Call fn, retrying transient network and 5xx failures with exponential backoff
+
+    Only for idempotent calls: a retry after a timeout may repeat a request
+    the server already handled.
+
+    Args:
+        fn: The function to call
+        max_retries: Number of retries after the first attempt
+        base: Base delay in seconds, doubled on each retry (plus jitter)
+
+    Returns:
+        Whatever fn returns; the last error is re-raised once retries run out
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            return fn(*args, **kwargs)
+        except (AuthRetryableError, httpx.TransportError):
+            if attempt == max_retries:
+                raise
+            time.sleep(base * 2 ** attempt + random.random() * 0.1)
+
+
+def _get_supabase_client(url: str, key: str) -> Client:
+    """
+    Get the Supabase client for this browser session (created once per session)
+
+    The client holds the logged-in user's session, so it is cached in
+    st.session_state rather than shared across sessions with st.cache_resource.
+    """
+    client = st.session_state.get('_supabase_client')
+    if client is None:
+        client = create_client(url, key, options=ClientOptions(httpx_client=_get_http_client()))
+        st.session_state._supabase_client = client
+    return client
 
 class AuthManager:
     """Manages user authentication and session state"""
     
     def __init__(self):
         """Initialize Supabase client"""
+        # Created once per browser session, so this seeds the auth keys
+        # once and every later read can index them directly
+        for key, value in _SIGNED_OUT_STATE.items():
+            st.session_state.setdefault(key, value)
+        st.session_state.setdefault('show_saved_recipes', False)
         self.supabase = None
         self._initialize_clients()
     
     def _initialize_clients(self):
         """Initialize Supabase client with proper error handling"""
         try:
-            self.supabase = create_client(
-                st.secrets["supabase_url"],
-                st.secrets["supabase_key"]
-            )
+            is_new_client = '_supabase_client' not in st.session_state
+            self.supabase = _get_supabase_client(_SUPABASE_URL, _SUPABASE_KEY)
 
-            # Restore session if user was previously logged in
-            if st.session_state.get('access_token') and st.session_state.get('refresh_token'):
-                try:
-                    self.supabase.auth.set_session(
-                        st.session_state.access_token,
-                        st.session_state.refresh_token
-                    )
-                except Exception:
+            # Restore session on a fresh client if user was previously logged in
+            if is_new_client and st.session_state['access_token'] and st.session_state['refresh_token']:
+                if not self.resume_session(st.session_state.access_token, st.session_state.refresh_token):
                     # Session expired; user will need to log in again
-                    st.session_state.user = None
-                    st.session_state.user_email = None
-                    st.session_state.access_token = None
-                    st.session_state.refresh_token = None
+                    st.session_state.update(_SIGNED_OUT_STATE)
+            elif is_new_client and not st.session_state['user']:
+                # New browser session (e.g. page refresh): try the session cookie
+                self._restore_session_from_cookie()
         except Exception as e:
             st.error(f"Error connecting to Supabase: {e}")
             st.info("Please check your Supabase configuration in secrets.toml")
@@ -51,24 +258,97 @@ class AuthManager:
         Returns:
             bool: True if login successful, False otherwise
         """
+        if not self._validate_credentials(email, password):
+            return False
         if not self.supabase:
             st.error("Authentication service is not available")
             return False
         
         try:
-            response = self.supabase.auth.sign_in_with_password({
+            response = _retry(self.supabase.auth.sign_in_with_password, {
                 "email": email,
                 "password": password
             })
             if response.user:
-                st.session_state.user = response.user.id
-                st.session_state.user_email = response.user.email
-                st.session_state.access_token = response.session.access_token
-                st.session_state.refresh_token = response.session.refresh_token
+                self._store_session(response.user, response.session)
                 return True
         except Exception as e:
             st.error(f"Login failed: {str(e)}")
         return False
+
+    def _store_session(self, user, session):
+        """Save the signed-in user and tokens to session state and the session cookie"""
+        st.session_state.user = user.id
+        st.session_state.user_email = user.email
+        st.session_state.access_token = session.access_token
+        st.session_state.refresh_token = session.refresh_token
+        if _COOKIE_SECRET:
+            value = f"{session.access_token}|{session.refresh_token}"
+            st.session_state._pending_session_cookie = (
+                f"{value}|{_sign_cookie_value(value)}", _SESSION_COOKIE_MAX_AGE
+            )
+
+    def resume_session(self, access_token: str, refresh_token: str) -> bool:
+        """
+        Resume a previous login from stored tokens instead of re-entering a password
+
+        Args:
+            access_token: The stored JWT access token
+            refresh_token: The stored refresh token
+
+        Returns:
+            bool: True if the session was resumed
+        """
+        if not self.supabase or not access_token or not refresh_token:
+            return False
+
+        access_token_expired = False
+        try:
+            _verify_jwt(access_token)
+        except jwt.ExpiredSignatureError:
+            access_token_expired = True
+        except jwt.InvalidTokenError:
+            # Not signed by this project; reject without asking Supabase
+            return False
+
+        response = None
+        if not access_token_expired:
+            try:
+                # Binds the stored JWT to the client, refreshing it first if it has expired
+                response = self.supabase.auth.set_session(access_token, refresh_token)
+            except Exception:
+                pass
+        if not response:
+            # Access token expired or rejected; the refresh token may still be valid
+            try:
+                response = self.supabase.auth.refresh_session(refresh_token)
+            except Exception:
+                response = None
+        if response and response.user and response.session:
+            # Re-store so refreshed tokens are written back to the cookie
+            self._store_session(response.user, response.session)
+            return True
+        return False
+
+    def _restore_session_from_cookie(self):
+        """Sign the user back in from the session cookie without a password round-trip"""
+        tokens = _read_session_cookie()
+        if tokens and not self.resume_session(*tokens):
+            # Expired or revoked; clear the cookie so we don't retry every visit
+            st.session_state._pending_session_cookie = ("", 0)
+
+    def _sync_session_cookie(self):
+        """Write any pending session cookie change to the browser"""
+        pending = st.session_state.get('_pending_session_cookie')
+        if not pending:
+            return
+        value, max_age = pending
+        components.html(
+            f"<script>window.parent.document.cookie = "
+            f"'{_SESSION_COOKIE}={value}; max-age={max_age}; path=/; SameSite=Strict';</script>",
+            height=0,
+        )
+        st.session_state._pending_session_cookie = None
     
     def signup(self, email: str, password: str) -> bool:
         """
@@ -81,11 +361,15 @@ class AuthManager:
         Returns:
             bool: True if signup successful, False otherwise
         """
+        if not self._validate_credentials(email, password):
+            return False
         if not self.supabase:
             st.error("Authentication service is not available")
             return False
         
         try:
+            # Not retried: a repeat could fail as "already registered" or
+            # send a second confirmation email
             response = self.supabase.auth.sign_up({
                 "email": email,
                 "password": password
@@ -97,46 +381,93 @@ class AuthManager:
             st.error(f"Sign up failed: {str(e)}")
         return False
     
+    @staticmethod
+    def _validate_credentials(email: str, password: str) -> bool:
+        """Reject malformed credentials locally before making an auth request"""
+        if not _EMAIL_RE.match(email.strip()):
+            st.error("Please enter a valid email address")
+            return False
+        if len(password) < _MIN_PASSWORD_LENGTH:
+            st.error(f"Password must be at least {_MIN_PASSWORD_LENGTH} characters")
+            return False
+        return True
+
     def logout(self):
         """Log out the current user"""
-        st.session_state.user = None
-        st.session_state.user_email = None
-        st.session_state.access_token = None
-        st.session_state.refresh_token = None
-        st.session_state.show_saved_recipes = False
+        # The cached client outlives this run, so drop its session too
+        if self.supabase:
+            try:
+                self.supabase.auth.sign_out()
+            except Exception:
+                pass
+        st.session_state.update(_SIGNED_OUT_STATE, show_saved_recipes=False)
+        if _COOKIE_SECRET:
+            st.session_state._pending_session_cookie = ("", 0)
     
     def is_authenticated(self) -> bool:
         """Check if a user is currently authenticated"""
-        return st.session_state.user is not None
+        return bool(st.session_state["user"])
     
     def get_user_id(self) -> Optional[str]:
         """Get the current user's ID"""
-        return st.session_state.user
+        return self._current_identity()[0]
     
     def get_user_email(self) -> Optional[str]:
         """Get the current user's email"""
-        return st.session_state.user_email
+        return self._current_identity()[1]
+
+    def _current_identity(self) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Get (user_id, email) for the current access token
+
+        The token is decoded and verified once, and the result is kept in
+        session state keyed by the token's hash. Verifying can need the JWKS
+        endpoint, so reruns must not repeat it.
+        """
+        token = st.session_state.get('access_token')
+        if not token:
+            return st.session_state.get('user'), st.session_state.get('user_email')
+
+        token_hash = hashlib.sha256(token.encode()).hexdigest()
+        if st.session_state.get('_identity_token_hash') != token_hash:
+            claims = _token_claims(token)
+            st.session_state._identity = (
+                claims.get('sub') or st.session_state.get('user'),
+                claims.get('email') or st.session_state.get('user_email'),
+            )
+            st.session_state._identity_token_hash = token_hash
+        return st.session_state._identity
     
     def render_sidebar(self):
         """Render the authentication sidebar"""
         st.markdown("## 👤 Account")
+        self._sync_session_cookie()
         
         if not self.is_authenticated():
-            # Show login/signup options
-            auth_tab1, auth_tab2 = st.tabs(["Login", "Sign Up"])
-            
-            with auth_tab1:
-                self._render_login_form()
-            
-            with auth_tab2:
-                self._render_signup_form()
+            self._render_auth_forms()
         else:
             # User is logged in
-            st.success(f"Logged in as: {self.get_user_email()}")
-            if st.button("Logout"):
-                self.logout()
-                st.rerun()
+            st.success(_GREETING.format(self.get_user_email()))
+            # Logging out in the click callback updates state before the
+            # natural rerun, so no extra st.rerun() pass is needed
+            st.button("Logout", on_click=self.logout)
     
+    @st.fragment
+    def _render_auth_forms(self):
+        """
+        Render the login/signup tabs as a fragment
+
+        Failed logins, signups and password resets only rerun this fragment;
+        a successful login calls st.rerun() to refresh the whole app.
+        """
+        auth_tab1, auth_tab2 = st.tabs(_AUTH_TABS)
+        
+        with auth_tab1:
+            self._render_login_form()
+        
+        with auth_tab2:
+            self._render_signup_form()
+
     def reset_password(self, email: str) -> bool:
         """
         Send a password reset email via Supabase.
@@ -160,18 +491,22 @@ class AuthManager:
     def _render_login_form(self):
         """Render the login form"""
         st.subheader("Login")
-        login_email = st.text_input("Email", key="login_email")
-        login_password = st.text_input("Password", type="password", key="login_password")
+        # A form only reruns the script on submit, not on every keystroke
+        with st.form(_LOGIN_FORM_KEY):
+            login_email = st.text_input("Email", key=_LOGIN_EMAIL_KEY)
+            login_password = st.text_input("Password", type="password", key=_LOGIN_PASSWORD_KEY)
+            login_submitted = st.form_submit_button("Login")
+            forgot_submitted = st.form_submit_button("Forgot Password?")
 
-        if st.button("Login", key="login_btn"):
+        if login_submitted:
             if login_email and login_password:
                 if self.login(login_email, login_password):
-                    st.success(f"Welcome back, {login_email}!")
+                    # Navigation depends on the login, so the whole app must rerun
                     st.rerun()
             else:
                 st.warning("Please enter email and password")
 
-        if st.button("Forgot Password?", key="forgot_pw_btn"):
+        if forgot_submitted:
             if login_email:
                 if self.reset_password(login_email):
                     st.success("Password reset email sent! Check your inbox.")
@@ -181,11 +516,13 @@ class AuthManager:
     def _render_signup_form(self):
         """Render the signup form"""
         st.subheader("Create Account")
-        signup_email = st.text_input("Email", key="signup_email")
-        signup_password = st.text_input("Password", type="password", key="signup_password")
-        signup_password_confirm = st.text_input("Confirm Password", type="password", key="signup_password_confirm")
+        with st.form(_SIGNUP_FORM_KEY):
+            signup_email = st.text_input("Email", key=_SIGNUP_EMAIL_KEY)
+            signup_password = st.text_input("Password", type="password", key=_SIGNUP_PASSWORD_KEY)
+            signup_password_confirm = st.text_input("Confirm Password", type="password", key=_SIGNUP_CONFIRM_KEY)
+            signup_submitted = st.form_submit_button("Sign Up")
         
-        if st.button("Sign Up", key="signup_btn"):
+        if signup_submitted:
             if signup_email and signup_password:
                 if signup_password == signup_password_confirm:
                     self.signup(signup_email, signup_password)
@@ -3,6 +3,8 @@ Dinner Recipe Maker - Main Application
 A comprehensive recipe generation app with multiple modes and features
 """
 
+from copy import copy
+
 import streamlit as st
 
 # Import custom modules
@@ -10,14 +12,7 @@ from auth import AuthManager
 from recipe_generator import RecipeGenerator
 from saved_recipes import SavedRecipesManager
 from meal_planner import MealPlanner
-from utils import (
-    get_current_holiday,
-    extract_recipe_name,
-    generate_shopping_list,
-    generate_recipe_card,
-    create_recipe_card_html,
-    initialize_session_state
-)
+from utils import get_current_holiday, initialize_session_state
 
 # Page configuration
 st.set_page_config(
@@ -28,51 +23,101 @@ st.set_page_config(
 
 initialize_session_state()
 
+# Preference options, shared by the defaults and the sidebar widgets
+_DIETARY_OPTS = (
+    "Vegetarian",
+    "Vegan",
+    "Gluten-free",
+    "Dairy-free",
+    "Low carb",
+    "Keto",
+    "Pescatarian",
+    "Nut-free",
+    "Paleo",
+    "Low-sodium",
+    "High-fiber",
+    "High-protein"
+)
+_ALLERGY_OPTS = ("Nuts", "Shellfish", "Eggs", "Soy", "Fish", "Sesame", "Other")
+_TIME_LIMIT_OPTS = (15, 30, 45, 60, 90)
+_SPICE_OPTS = ("Low", "Medium", "Hot")
+_BUDGET_OPTS = ("Low", "Medium", "High")
+_SPICE_INDEX = {level: i for i, level in enumerate(_SPICE_OPTS)}
+_BUDGET_INDEX = {level: i for i, level in enumerate(_BUDGET_OPTS)}
+
 # -------------------------
 # NEW: Preference defaults
 # -------------------------
+_PREF_DEFAULTS = {
+    "pref_servings": 4,
+    "pref_time_limit": 30,          # minutes
+    "pref_dietary": [],             # multi-select
+    "pref_spice_level": "Medium",   # one of _SPICE_OPTS
+    "pref_budget": "Medium",        # one of _BUDGET_OPTS
+    "pref_include_leftovers": False,
+    "pref_allergies": [],
+    "pref_prefetch_extras": False,  # fetch card + shopping list with each recipe
+    "pref_batch_extras": False,     # queue card + shopping list on the Batch API
+    "dark_mode": False
+}
+
 def initialize_preferences():
-    defaults = {
-        "pref_servings": 4,
-        "pref_time_limit": 30,          # minutes
-        "pref_dietary": [],             # multi-select
-        "pref_spice_level": "Medium",   # Low/Medium/Hot
-        "pref_budget": "Medium",        # Low/Medium/High
-        "pref_include_leftovers": False,
-        "pref_allergies": [],
-        "dark_mode": False
-    }
-    for k, v in defaults.items():
-        if k not in st.session_state:
-            st.session_state[k] = v
+    for k, v in _PREF_DEFAULTS.items():
+        # Copied so sessions never share a mutable default like a list
+        st.session_state.setdefault(k, copy(v))
+
+def reset_preferences():
+    """Button callback; runs before the widgets are drawn, so their keys can be set"""
+    st.session_state.update({k: copy(v) for k, v in _PREF_DEFAULTS.items()})
 
 initialize_preferences()
 
-# Dark mode CSS
+# Dark mode CSS. Streamlit drops any element a run doesn't emit, so the style
+# block has to be written on every run while dark mode is on
+_DARK_MODE_CSS = """
+<style>
+    :root { color-scheme: dark; }
+    .stApp, [data-testid="stAppViewContainer"] { background-color: #0e1117; color: #fafafa; }
+    [data-testid="stSidebar"] > div { background-color: #262730; }
+    [data-testid="stHeader"] { background-color: rgba(14, 17, 23, 0.8); }
+    .stTextInput > div > div > input,
+    .stTextArea > div > div > textarea { background-color: #262730; color: #fafafa; }
+    .stSelectbox > div > div, .stMultiSelect > div > div { background-color: #262730; }
+    .stTabs [data-baseweb="tab-list"] { background-color: transparent; }
+    .stExpander { border-color: #555; }
+</style>
+"""
+
 if st.session_state.get('dark_mode', False):
-    st.markdown("""
-    <style>
-        :root { color-scheme: dark; }
-        .stApp, [data-testid="stAppViewContainer"] { background-color: #0e1117; color: #fafafa; }
-        [data-testid="stSidebar"] > div { background-color: #262730; }
-        [data-testid="stHeader"] { background-color: rgba(14, 17, 23, 0.8); }
-        .stTextInput > div > div > input,
-        .stTextArea > div > div > textarea { background-color: #262730; color: #fafafa; }
-        .stSelectbox > div > div, .stMultiSelect > div > div { background-color: #262730; }
-        .stTabs [data-baseweb="tab-list"] { background-color: transparent; }
-        .stExpander { border-color: #555; }
-    </style>
-    """, unsafe_allow_html=True)
+    st.markdown(_DARK_MODE_CSS, unsafe_allow_html=True)
 
-# Navigation state
-if "page" not in st.session_state:
-    st.session_state.page = "Recipe Generator"
+_GENERATOR_TABS = (
+    "🍽️ Recipe by Cuisine",
+    "🥘 Recipe by Fridge Items",
+    "📸 Photo Recipe Finder",
+    "🎉 Holiday & Special Occasions"
+)
 
-# Initialize managers
-auth_manager = AuthManager()
-recipe_gen = RecipeGenerator()
-saved_recipes_manager = SavedRecipesManager(auth_manager.supabase)
-meal_planner = MealPlanner(auth_manager.supabase)
+# Navigation state
+st.session_state.setdefault("page", "Recipe Generator")
+
+@st.cache_resource
+def get_recipe_generator() -> RecipeGenerator:
+    """The recipe generator holds no per-user state, so one instance serves every session"""
+    return RecipeGenerator()
+
+# Initialize managers. The auth, saved recipes and meal planner managers hold this
+# browser session's Supabase client (RLS is per user), so they are built once per
+# session rather than shared through st.cache_resource
+if "auth_manager" not in st.session_state:
+    st.session_state.auth_manager = AuthManager()
+auth_manager = st.session_state.auth_manager
+if "saved_recipes_manager" not in st.session_state:
+    st.session_state.saved_recipes_manager = SavedRecipesManager(auth_manager.supabase)
+    st.session_state.meal_planner = MealPlanner(auth_manager.supabase)
+recipe_gen = get_recipe_generator()
+saved_recipes_manager = st.session_state.saved_recipes_manager
+meal_planner = st.session_state.meal_planner
 
 # Streamlit UI
 st.title("🍴 Dinner Recipe Maker")
@@ -80,34 +125,11 @@ st.title("🍴 Dinner Recipe Maker")
 # Get current holiday/occasion
 holiday_name, holiday_desc = get_current_holiday()
 
-# -------------------------
-# Sidebar: Auth + Nav + Preferences
-# -------------------------
-with st.sidebar:
-    auth_manager.render_sidebar()
-
-    st.markdown("---")
-    st.markdown("### 🧭 Navigate")
-
-    nav_options = ["Recipe Generator"]
-    if st.session_state.user:
-        nav_options.append("Saved Recipes")
-        nav_options.append("Meal Planner")
-    nav_options.append("About")
-
-    selected = st.radio(
-        label="",
-        options=nav_options,
-        index=nav_options.index(st.session_state.page) if st.session_state.page in nav_options else 0,
-        key="nav_radio"
-    )
-    st.session_state.page = selected
-
-    # NEW: Global preferences (available to all tabs)
-    st.markdown("---")
-    st.markdown("### ⚙️ Preferences")
-
-    with st.expander("Recipe preferences", expanded=True):
+@st.fragment
+def render_recipe_preferences():
+    """Prompt preferences, applied together from one form. They are only read when
+    a recipe is generated, so applying them reruns just this fragment"""
+    with st.form("prefs_form", border=False):
         st.slider(
             "Servings",
             min_value=1,
@@ -118,7 +140,7 @@ with st.sidebar:
 
         st.select_slider(
             "Time limit",
-            options=[15, 30, 45, 60, 90],
+            options=_TIME_LIMIT_OPTS,
             value=st.session_state.pref_time_limit,
             key="pref_time_limit",
             help="Target max time to cook."
@@ -126,46 +148,30 @@ with st.sidebar:
 
         st.multiselect(
             "Dietary",
-            options=[
-                "Vegetarian",
-                "Vegan",
-                "Gluten-free",
-                "Dairy-free",
-                "Low carb",
-                "Keto",
-                "Pescatarian",
-                "Nut-free",
-                "Paleo",
-                "Low-sodium",
-                "High-fiber",
-                "High-protein"
-            ],
+            options=_DIETARY_OPTS,
             default=st.session_state.pref_dietary,
             key="pref_dietary"
         )
 
         st.multiselect(
             "Allergies",
-            options=[
-                "Nuts", "Shellfish", "Eggs", "Soy",
-                "Fish", "Sesame", "Other"
-            ],
+            options=_ALLERGY_OPTS,
             default=st.session_state.pref_allergies,
             key="pref_allergies"
         )
 
         st.radio(
             "Spice level",
-            options=["Low", "Medium", "Hot"],
-            index=["Low", "Medium", "Hot"].index(st.session_state.pref_spice_level),
+            options=_SPICE_OPTS,
+            index=_SPICE_INDEX[st.session_state.pref_spice_level],
             key="pref_spice_level",
             horizontal=True
         )
 
         st.radio(
             "Budget",
-            options=["Low", "Medium", "High"],
-            index=["Low", "Medium", "High"].index(st.session_state.pref_budget),
+            options=_BUDGET_OPTS,
+            index=_BUDGET_INDEX[st.session_state.pref_budget],
             key="pref_budget",
             horizontal=True,
             help="Rough ingredient cost preference."
@@ -177,6 +183,54 @@ with st.sidebar:
             key="pref_include_leftovers"
         )
 
+        st.form_submit_button("Apply preferences", use_container_width=True)
+
+# -------------------------
+# Sidebar: Auth + Nav + Preferences
+# -------------------------
+with st.sidebar:
+    auth_manager.render_sidebar()
+
+    st.markdown("---")
+    st.markdown("### 🧭 Navigate")
+
+    nav_options = ["Recipe Generator"]
+    if st.session_state.user:
+        nav_options.append("Saved Recipes")
+        nav_options.append("Meal Planner")
+    nav_options.append("About")
+    nav_index = {option: i for i, option in enumerate(nav_options)}
+
+    selected = st.radio(
+        label="",
+        options=nav_options,
+        index=nav_index.get(st.session_state.page, 0),
+        key="nav_radio"
+    )
+    st.session_state.page = selected
+
+    # NEW: Global preferences (available to all tabs)
+    st.markdown("---")
+    st.markdown("### ⚙️ Preferences")
+
+    with st.expander("Recipe preferences", expanded=True):
+        render_recipe_preferences()
+
+        st.toggle(
+            "Prepare shopping list & recipe card in advance",
+            value=st.session_state.pref_prefetch_extras,
+            key="pref_prefetch_extras",
+            help="Fetches both right after each recipe so the buttons respond instantly, "
+                 "at the cost of an extra API call per recipe."
+        )
+
+        st.toggle(
+            "Queue shopping list & recipe card for batch pricing",
+            value=st.session_state.pref_batch_extras,
+            key="pref_batch_extras",
+            help="Half the API cost, but results can take up to 24 hours."
+        )
+
     st.markdown("---")
     st.toggle(
         "🌙 Dark mode",
@@ -185,21 +239,7 @@ with st.sidebar:
     )
 
     # Optional: Quick "reset preferences"
-    if st.button("Reset preferences", use_container_width=True):
-        for k in [
-            "pref_servings",
-            "pref_time_limit",
-            "pref_dietary",
-            "pref_spice_level",
-            "pref_budget",
-            "pref_include_leftovers",
-            "pref_allergies",
-            "dark_mode"
-        ]:
-            if k in st.session_state:
-                del st.session_state[k]
-        initialize_preferences()
-        st.rerun()
+    st.button("Reset preferences", use_container_width=True, on_click=reset_preferences)
 
 # -------------------------
 # PAGE ROUTING
@@ -232,53 +272,47 @@ else:
     elif holiday_name:
         st.success(f"🍂 **{holiday_name}** - Great time for {holiday_desc}")
 
-    # Surprise Me button
-    if st.button("🎲 Surprise Me!", use_container_width=True,
-                 help="Generate a random recipe based on your preferences"):
-        surprise_prompt = recipe_gen.generate_surprise_prompt()
-        with st.spinner("Cooking up something special..."):
-            content = recipe_gen.generate_recipe(surprise_prompt)
+    # Surprise Me button. The recipe and its tools share one placeholder, so a
+    # new recipe replaces the old block in place instead of reflowing the page
+    just_generated = False
+    surprise_clicked = st.button("🎲 Surprise Me!", use_container_width=True,
+                                 help="Generate a random recipe based on your preferences")
+    surprise_slot = st.empty()
+    with surprise_slot.container():
+        if surprise_clicked:
+            surprise_prompt = recipe_gen.generate_surprise_prompt()
+            st.markdown("### 🎲 Surprise Recipe!")
+            # A surprise should never replay a recipe someone else already got
+            content = recipe_gen.generate_recipe(surprise_prompt, refresh=True)
+            just_generated = bool(content)
             if content:
                 st.session_state.surprise_recipe_content = content
                 st.session_state.surprise_shopping_list = ""
                 st.session_state.surprise_recipe_card = ""
 
-    if st.session_state.get('surprise_recipe_content'):
-        st.markdown("### 🎲 Surprise Recipe!")
-        st.write(st.session_state.surprise_recipe_content)
-        st.markdown("---")
-        if st.session_state.user:
-            saved_recipes_manager.render_save_button(
-                st.session_state.surprise_recipe_content,
-                "surprise",
-                {"cuisine": None, "meal_type": "Dinner", "complexity": None,
-                 "occasion": None, "cooking_method": None,
-                 "dietary_tags": recipe_gen._get_dietary_tags()},
-                "save_surprise_recipe"
-            )
-        recipe_gen.render_recipe_output(
-            st.session_state.surprise_recipe_content,
-            "surprise",
-            "surprise_shopping_list_btn",
-            "surprise_recipe_card_btn"
+        surprise_content = recipe_gen.render_recipe_result(
+            saved_recipes_manager, "surprise", "🎲 Surprise Recipe!", just_generated,
+            {"meal_type": "Dinner"}
         )
-        st.markdown("---")
-
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "🍽️ Recipe by Cuisine",
-        "🥘 Recipe by Fridge Items",
-        "📸 Photo Recipe Finder",
-        "🎉 Holiday & Special Occasions"
-    ])
+        if surprise_content:
+            st.markdown("---")
+
+    # Only the selected mode is rendered (st.tabs would build all four every
+    # run), and each mode renders as a fragment, so clicking or typing in one
+    # reruns only that mode rather than the sidebar and the whole page
+    active_tab = st.radio(
+        "Mode",
+        options=_GENERATOR_TABS,
+        horizontal=True,
+        label_visibility="collapsed",
+        key="active_tab"
+    )
 
-    with tab1:
+    if active_tab == _GENERATOR_TABS[0]:
         recipe_gen.render_cuisine_tab(saved_recipes_manager)
-
-    with tab2:
+    elif active_tab == _GENERATOR_TABS[1]:
         recipe_gen.render_fridge_tab(saved_recipes_manager)
-
-    with tab3:
+    elif active_tab == _GENERATOR_TABS[2]:
         recipe_gen.render_photo_tab(saved_recipes_manager)
-
-    with tab4:
+    else:
         recipe_gen.render_holiday_tab(saved_recipes_manager, holiday_name, holiday_desc)
@@ -4,10 +4,68 @@ Handles meal planning, weekly calendar view, and combined shopping lists
 """
 
 import streamlit as st
+from collections import defaultdict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import date, timedelta
-from typing import Optional, Dict, Any, List
+from typing import Optional, Dict, Any, List, Tuple
+from streamlit.runtime.scriptrunner import add_script_run_ctx, get_script_run_ctx
+from saved_recipes import fetch_saved_recipe_names
 from utils import generate_weekly_shopping_list, generate_ics_calendar
 
+# Columns the planner views, shopping list and calendar export read
+_MEAL_COLUMNS = "id,recipe_name,planned_date,meal_slot,notes,recipe_id"
+
+def _picker_label(recipe: Dict) -> str:
+    """A saved recipe's name in the picker, starred if it is a favorite"""
+    return ("⭐ " if recipe.get("is_favorite") else "") + recipe["recipe_name"]
+
+@st.cache_data(ttl=60, show_spinner=False)
+def fetch_planned_meals(_client, user_id: str, week_iso: str) -> List[Dict]:
+    """
+    Fetch a user's meal plan entries for the week starting on week_iso
+
+    Cached like saved_recipes._fetch_user_recipes: the client is left out of
+    the key, and entries are cleared whenever a meal is added or removed, or
+    a saved recipe they join is edited or deleted.
+    """
+    week_start = date.fromisoformat(week_iso)
+    week_end = week_start + timedelta(days=6)
+
+    def select(columns: str):
+        return (
+            _client.table("meal_plans")
+            .select(columns)
+            .eq("user_id", user_id)
+            .gte("planned_date", week_iso)
+            .lte("planned_date", week_end.isoformat())
+            .order("planned_date")
+            .order("meal_slot")
+            .execute()
+        )
+
+    try:
+        return select(f"{_MEAL_COLUMNS},saved_recipes(recipe_content)").data
+    except Exception:
+        pass
+
+    # If the join fails (FK not detected), select the meals alone and attach
+    # the linked recipes' content from one batched query, in the join's shape
+    meals = select(_MEAL_COLUMNS).data
+    recipe_ids = list({meal["recipe_id"] for meal in meals if meal.get("recipe_id")})
+    if recipe_ids:
+        rows = (
+            _client.table("saved_recipes")
+            .select("id, recipe_content")
+            .in_("id", recipe_ids)
+            .execute()
+            .data
+        )
+        content_by_id = {str(row["id"]): row["recipe_content"] for row in rows}
+        for meal in meals:
+            content = content_by_id.get(str(meal.get("recipe_id")))
+            meal["saved_recipes"] = {"recipe_content": content} if content else None
+    return meals
+
 
 class MealPlanner:
     """Manages weekly meal planning functionality"""
@@ -40,10 +98,9 @@ class MealPlanner:
             today = date.today()
             monday = today - timedelta(days=today.weekday())
             st.session_state.meal_planner_week_start = monday
-        if "meal_planner_shopping_list" not in st.session_state:
-            st.session_state.meal_planner_shopping_list = ""
-        if "confirm_delete_meal_id" not in st.session_state:
-            st.session_state.confirm_delete_meal_id = None
+        st.session_state.setdefault("meal_planner_shopping_list", "")
+        # Meals marked for removal, deleted together by "Save changes"
+        st.session_state.setdefault("meal_planner_pending_deletes", set())
 
     # ------------------------------------------------------------------
     # CRUD helpers
@@ -55,18 +112,20 @@ class MealPlanner:
             return False
         try:
             self.supabase_client.table("meal_plans").insert(meal_data).execute()
+            fetch_planned_meals.clear()
             return True
         except Exception as e:
             st.error(f"Error adding meal to plan: {e}")
             return False
 
-    def remove_meal_from_plan(self, meal_plan_id: str) -> bool:
-        """Delete a single meal plan entry by its id."""
+    def remove_meals_from_plan(self, meal_plan_ids: List[str]) -> bool:
+        """Delete meal plan entries by id in a single request."""
         if not self.supabase_client:
             st.error("Database connection not available")
             return False
         try:
-            self.supabase_client.table("meal_plans").delete().eq("id", meal_plan_id).execute()
+            self.supabase_client.table("meal_plans").delete().in_("id", meal_plan_ids).execute()
+            fetch_planned_meals.clear()
             return True
         except Exception as e:
             st.error(f"Error removing meal from plan: {e}")
@@ -77,52 +136,17 @@ class MealPlanner:
         if not self.supabase_client:
             return None
         try:
-            week_end = week_start + timedelta(days=6)
-            response = (
-                self.supabase_client.table("meal_plans")
-                .select("*, saved_recipes(recipe_content)")
-                .eq("user_id", user_id)
-                .gte("planned_date", week_start.isoformat())
-                .lte("planned_date", week_end.isoformat())
-                .order("planned_date")
-                .order("meal_slot")
-                .execute()
-            )
-            return response.data
+            return fetch_planned_meals(self.supabase_client, user_id, week_start.isoformat())
         except Exception as e:
-            # If the join fails (FK not detected), fall back to a plain select
-            try:
-                response = (
-                    self.supabase_client.table("meal_plans")
-                    .select("*")
-                    .eq("user_id", user_id)
-                    .gte("planned_date", week_start.isoformat())
-                    .lte("planned_date", week_end.isoformat())
-                    .order("planned_date")
-                    .order("meal_slot")
-                    .execute()
-                )
-                return response.data
-            except Exception as e2:
-                st.error(f"Error loading meal plan: {e2}")
-                return None
+            st.error(f"Error loading meal plan: {e}")
+            return None
 
     def _get_user_saved_recipes(self) -> Optional[List[Dict]]:
         """Fetch saved recipes for the picker dropdown, favorites first."""
         if not self.supabase_client:
             return None
         try:
-            response = (
-                self.supabase_client.table("saved_recipes")
-                .select("id, recipe_name, is_favorite")
-                .eq("user_id", st.session_state.user)
-                .order("recipe_name")
-                .execute()
-            )
-            recipes = response.data or []
-            # Sort favorites to the top
-            recipes.sort(key=lambda r: (0 if r.get('is_favorite') else 1, r.get('recipe_name', '')))
-            return recipes
+            return fetch_saved_recipe_names(self.supabase_client, st.session_state.user) or []
         except Exception as e:
             st.error(f"Error loading saved recipes: {e}")
             return None
@@ -131,21 +155,19 @@ class MealPlanner:
     # Data helpers
     # ------------------------------------------------------------------
     def _organize_meals_into_grid(self, meals: List[Dict], week_start: date) -> Dict:
-        """Return ``{date_iso: {slot: [meal, ...]}}`` for the 7-day window."""
-        grid: Dict[str, Dict[str, List]] = {}
-        for day_offset in range(7):
-            day = week_start + timedelta(days=day_offset)
-            day_str = day.isoformat()
-            grid[day_str] = {slot: [] for slot in self.MEAL_SLOTS}
-
-        if meals:
-            for meal in meals:
-                day_str = meal.get("planned_date", "")
-                slot = meal.get("meal_slot", "")
-                if day_str in grid and slot in grid[day_str]:
-                    grid[day_str][slot].append(meal)
+        """
+        Return ``{(date_iso, slot): [meal, ...]}`` for the 7-day window; empty cells are left out.
+        """
+        valid_days = {(week_start + timedelta(days=i)).isoformat() for i in range(7)}
+        valid_slots = set(self.MEAL_SLOTS)
+        buckets: Dict[Tuple[str, str], List[Dict]] = defaultdict(list)
+        for meal in meals:
+            day_str = meal.get("planned_date", "")
+            slot = meal.get("meal_slot", "")
+            if day_str in valid_days and slot in valid_slots:
+                buckets[(day_str, slot)].append(meal)
 
-        return grid
+        return dict(buckets)
 
     # ------------------------------------------------------------------
     # Rendering: top-level
@@ -163,18 +185,28 @@ class MealPlanner:
 
         st.markdown("---")
 
-        # Load data
+        # Load data. The week's meals and the recipe picker are independent
+        # reads, so they run concurrently; the picker is only fetched when the
+        # add-meal form will show it. Workers get this run's context so their
+        # error messages still reach the page.
         week_start = st.session_state.meal_planner_week_start
-        meals = self.get_meals_for_week(st.session_state.user, week_start)
+        want_recipes = st.session_state.get("meal_source_radio", "Saved recipe") == "Saved recipe"
+        with ThreadPoolExecutor(max_workers=2, initializer=add_script_run_ctx,
+                                initargs=(None, get_script_run_ctx())) as executor:
+            meals_future = executor.submit(self.get_meals_for_week, st.session_state.user, week_start)
+            recipes_future = executor.submit(self._get_user_saved_recipes) if want_recipes else None
+        meals = meals_future.result()
+        saved_recipes = recipes_future.result() if recipes_future else None
         grid = self._organize_meals_into_grid(meals or [], week_start)
 
         # Calendar grid
         self._render_weekly_calendar(grid, week_start)
+        self._render_pending_deletes()
 
         st.markdown("---")
 
         # Add-meal form
-        self._render_add_meal_form(week_start)
+        self._render_add_meal_form(week_start, saved_recipes)
 
         st.markdown("---")
 
@@ -199,9 +231,7 @@ class MealPlanner:
 
         with col1:
             if st.button("← Previous Week", use_container_width=True):
-                st.session_state.meal_planner_week_start = week_start - timedelta(weeks=1)
-                st.session_state.meal_planner_shopping_list = ""
-                st.rerun()
+                self._go_to_week(week_start - timedelta(weeks=1))
 
         with col2:
             st.markdown(
@@ -209,15 +239,20 @@ class MealPlanner:
             )
             if week_start != current_monday:
                 if st.button("Jump to Current Week", use_container_width=True):
-                    st.session_state.meal_planner_week_start = current_monday
-                    st.session_state.meal_planner_shopping_list = ""
-                    st.rerun()
+                    self._go_to_week(current_monday)
 
         with col3:
             if st.button("Next Week →", use_container_width=True):
-                st.session_state.meal_planner_week_start = week_start + timedelta(weeks=1)
-                st.session_state.meal_planner_shopping_list = ""
-                st.rerun()
+                self._go_to_week(week_start + timedelta(weeks=1))
+
+    @staticmethod
+    def _go_to_week(week_start: date):
+        """Show another week, dropping state that belongs to the current one"""
+        st.session_state.meal_planner_week_start = week_start
+        st.session_state.meal_planner_shopping_list = ""
+        # Unsaved removals are for meals no longer on screen
+        st.session_state.meal_planner_pending_deletes.clear()
+        st.rerun()
 
     # ------------------------------------------------------------------
     # Rendering: 7-day calendar grid
@@ -225,6 +260,10 @@ class MealPlanner:
     def _render_weekly_calendar(self, grid: Dict, week_start: date):
         today = date.today()
         cols = st.columns(7)
+        # Read once rather than for each of the 28 slots and every meal
+        slots = self.MEAL_SLOTS
+        slot_icons = self.SLOT_ICONS
+        pending_deletes = st.session_state.meal_planner_pending_deletes
 
         for day_offset, col in enumerate(cols):
             day = week_start + timedelta(days=day_offset)
@@ -240,42 +279,51 @@ class MealPlanner:
                     st.markdown(f"**{day_name}**  \n{day.strftime('%m/%d')}")
 
                 # Meal slots
-                for slot in self.MEAL_SLOTS:
-                    meals_in_slot = grid[day_str][slot]
-                    icon = self.SLOT_ICONS.get(slot, "🍽️")
+                for slot in slots:
+                    meals_in_slot = grid.get((day_str, slot), ())
+                    icon = slot_icons.get(slot, "🍽️")
                     st.caption(f"{icon} {slot}")
 
                     if meals_in_slot:
                         for meal in meals_in_slot:
+                            # Marking and unmarking only touch session state;
+                            # the database is updated once, from "Save changes"
+                            if meal['id'] in pending_deletes:
+                                st.markdown(f"~~{meal['recipe_name']}~~")
+                                st.button("↺", key=f"undo_del_{meal['id']}", help="Keep in plan",
+                                          on_click=pending_deletes.discard, args=(meal['id'],))
+                                continue
                             st.markdown(f"**{meal['recipe_name']}**")
                             if meal.get("notes"):
                                 st.caption(meal["notes"])
-                            if st.session_state.confirm_delete_meal_id == meal['id']:
-                                st.caption("Remove?")
-                                c1, c2 = st.columns(2)
-                                with c1:
-                                    if st.button("Yes", key=f"confirm_meal_{meal['id']}", help="Confirm"):
-                                        if self.remove_meal_from_plan(meal['id']):
-                                            st.session_state.confirm_delete_meal_id = None
-                                            st.session_state.meal_planner_shopping_list = ""
-                                            st.rerun()
-                                with c2:
-                                    if st.button("No", key=f"cancel_meal_{meal['id']}", help="Cancel"):
-                                        st.session_state.confirm_delete_meal_id = None
-                                        st.rerun()
-                            else:
-                                if st.button("✕", key=f"del_{meal['id']}", help="Remove from plan"):
-                                    st.session_state.confirm_delete_meal_id = meal['id']
-                                    st.rerun()
+                            st.button("✕", key=f"del_{meal['id']}", help="Remove from plan",
+                                      on_click=pending_deletes.add, args=(meal['id'],))
                     else:
                         st.caption("—")
 
                 st.markdown("---")
 
+    def _render_pending_deletes(self):
+        """Save or discard the meals marked for removal in the calendar."""
+        pending_deletes = st.session_state.meal_planner_pending_deletes
+        if not pending_deletes:
+            return
+
+        col1, col2 = st.columns(2)
+        with col1:
+            if st.button(f"Save changes ({len(pending_deletes)} to remove)",
+                         type="primary", use_container_width=True):
+                if self.remove_meals_from_plan(list(pending_deletes)):
+                    pending_deletes.clear()
+                    st.session_state.meal_planner_shopping_list = ""
+                    st.rerun()
+        with col2:
+            st.button("Discard changes", use_container_width=True, on_click=pending_deletes.clear)
+
     # ------------------------------------------------------------------
     # Rendering: add-meal form
     # ------------------------------------------------------------------
-    def _render_add_meal_form(self, week_start: date):
+    def _render_add_meal_form(self, week_start: date, saved_recipes: Optional[List[Dict]]):
         st.subheader("Add a Meal")
 
         # Let user choose between a saved recipe or custom text
@@ -293,17 +341,16 @@ class MealPlanner:
             recipe_name = ""
 
             if source == "Saved recipe":
-                saved_recipes = self._get_user_saved_recipes()
                 with col1:
                     if saved_recipes:
-                        recipe_options = {r["id"]: r["recipe_name"] for r in saved_recipes}
-                        recipe_favs = {r["id"]: r.get("is_favorite", False) for r in saved_recipes}
-                        selected_recipe_id = st.selectbox(
+                        # The rows themselves are the options, so no id lookups are built
+                        selected_recipe = st.selectbox(
                             "Select a recipe",
-                            options=list(recipe_options.keys()),
-                            format_func=lambda x: ("⭐ " if recipe_favs.get(x) else "") + recipe_options[x],
+                            options=saved_recipes,
+                            format_func=_picker_label,
                         )
-                        recipe_name = recipe_options.get(selected_recipe_id, "")
+                        selected_recipe_id = selected_recipe["id"]
+                        recipe_name = selected_recipe["recipe_name"]
                     else:
                         st.info("No saved recipes yet — save some first, or use 'Custom meal'.")
             else:
@@ -361,14 +408,11 @@ class MealPlanner:
             return
 
         # Count only meals that have linked recipe content
-        recipes_with_content = []
-        for meal in meals:
-            content = None
-            saved = meal.get("saved_recipes")
-            if isinstance(saved, dict):
-                content = saved.get("recipe_content")
-            if content:
-                recipes_with_content.append((meal, content))
+        recipes_with_content = [
+            (meal, saved["recipe_content"])
+            for meal in meals
+            if isinstance(saved := meal.get("saved_recipes"), dict) and saved.get("recipe_content")
+        ]
 
         total_meals = len(meals)
         with_content = len(recipes_with_content)
@@ -380,11 +424,17 @@ class MealPlanner:
             return
 
         if st.button("Generate Weekly Shopping List", key="weekly_shopping_btn", use_container_width=True):
-            recipe_texts = []
+            # A recipe planned several times is sent once, with its count and dates
+            by_recipe: Dict[str, Tuple[str, str, List[str]]] = {}
             for meal, content in recipes_with_content:
-                recipe_texts.append(
-                    f"--- {meal['recipe_name']} ({meal['meal_slot']}, {meal['planned_date']}) ---\n{content}"
+                key = meal.get("recipe_id") or meal["recipe_name"]
+                by_recipe.setdefault(key, (meal["recipe_name"], content, []))[2].append(
+                    f"{meal['meal_slot']}, {meal['planned_date']}"
                 )
+            recipe_texts = [
+                f"--- {name} (x{len(occasions)}: {'; '.join(occasions)}) ---\n{content}"
+                for name, content, occasions in by_recipe.values()
+            ]
 
             combined_text = "\n\n".join(recipe_texts)
 
@@ -5,14 +5,20 @@ Handles all recipe generation functionality for different modes
 
 import streamlit as st
 import base64
+import hashlib
 import random
-from PIL import Image
-import io
-from typing import Dict, Any, List
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import lru_cache
+from typing import Dict, Any, List, Tuple
+from response_cache import cached_chat_completion, similar_chat_completion
 from utils import (
+    MODEL,
     get_openai_client,
-    generate_shopping_list,
+    stream_shopping_list,
     generate_recipe_card,
+    generate_card_and_list,
+    submit_card_and_list_batch,
+    fetch_card_and_list_batch,
     create_recipe_card_html,
     extract_recipe_name,
     generate_nutritional_info,
@@ -20,16 +26,298 @@ from utils import (
     scale_recipe
 )
 
+_PROMPT_CACHE_KEY = "recipe-app-chef"
+
+# Sampling settings for recipe generation. The cap leaves room for the longer
+# holiday recipes (make-ahead timelines, plating notes) without running on.
+_RECIPE_OPTIONS = {
+    "max_tokens": 1500,
+    "temperature": 0.7,
+    "top_p": 1.0,
+    # Routes requests that share the system prompt to the same prompt cache
+    "extra_body": {"prompt_cache_key": _PROMPT_CACHE_KEY},
+}
+
+# Cooking method choice -> phrase used in the prompt ("Any method" adds nothing)
+METHOD_MAPPING = {
+    "One-pot/One-pan": "one-pot or one-pan",
+    "Slow cooker": "slow cooker",
+    "Air fryer": "air fryer",
+    "Instant Pot/Pressure cooker": "Instant Pot or pressure cooker",
+    "Oven/Baking": "oven-baked",
+    "Stovetop": "stovetop",
+    "Grilling": "grilled",
+    "No-cook/Raw": "no-cook",
+    "Microwave": "microwave"
+}
+COOKING_METHODS = ["Any method", *METHOD_MAPPING]
+
+# Surprise Me draws one of each at random
+_SURPRISE_CUISINES = (
+    "American", "Chinese", "French", "Greek", "Indian", "Italian",
+    "Japanese", "Korean", "Mediterranean", "Mexican", "Thai",
+    "Vietnamese", "Middle Eastern", "Southern/Soul Food"
+)
+_SURPRISE_STYLES = (
+    "comfort food", "light and healthy", "quick weeknight",
+    "impressive date night", "family-friendly", "adventurous and bold",
+    "rustic and hearty", "elegant and refined"
+)
+
+# Vision instruction for the photo tab. Kept short: unlike the chef system
+# prompt it is not a cached prefix, so every word is billed on each photo.
+_PHOTO_ANALYSIS_PROMPT = (
+    "List the cooking ingredients clearly visible in this image (produce, packaged "
+    "goods, dairy, meat, spices, condiments) as one comma-separated list, nothing else. "
+    "Be specific, e.g. 'red bell peppers' not 'peppers'."
+)
+
+# Holiday special requirements: (key, checkbox label, default, prompt phrase), in prompt order
+SPECIAL_REQUIREMENTS = (
+    ("make_ahead", "Can be made ahead of time", False, "can be made ahead of time"),
+    ("crowd_pleaser", "Crowd-pleaser (appeals to most tastes)", True,
+     "crowd-pleaser that appeals to most tastes"),
+    ("budget_friendly", "Budget-friendly", False, "budget-friendly"),
+    ("impressive", "Visually impressive presentation", False, "visually impressive presentation"),
+    ("traditional", "Traditional/Classic recipe", False, "traditional/classic recipe"),
+    ("modern_twist", "Modern twist on classic", False, "modern twist on a classic"),
+)
+
+# Shared system prompt for every recipe request. It is long and never changes,
+# so it forms a stable prefix that OpenAI's automatic prompt caching can reuse
+# (caching only applies to prefixes of 1024+ tokens); everything that varies
+# per request goes in the short user message after it.
+CHEF_SYSTEM_PROMPT = """\
+You are a helpful chef assistant for the Dinner Recipe Maker app. You write
+reliable, home-cook friendly recipes that can be followed without any other
+reference, using ingredients found in an ordinary grocery store.
+
+# Output format
+
+Always answer with exactly one recipe, formatted in markdown as follows:
+
+# [Recipe Name]
+
+A one or two sentence description of the dish.
+
+**Servings:** [number]  |  **Prep Time:** [time]  |  **Cook Time:** [time]  |  **Total Time:** [time]
+
+## Ingredients
+
+- [quantity] [ingredient], [preparation if any]
+
+## Instructions
+
+1. [First step]
+2. [Second step]
+
+## Tips & Notes
+
+- [Substitutions, make-ahead, storage or reheating advice]
+
+Formatting rules:
+- The first line is always the recipe name as a level-one heading, with no
+  greeting or preamble before it and no closing remarks after the tips.
+- Number instruction steps sequentially (1. 2. 3.), one action per step.
+- Give every ingredient a quantity in US units, with metric in parentheses
+  for weights where it helps (e.g. "1 lb (450 g) chicken thighs").
+- Include oven temperatures in both Fahrenheit and Celsius.
+- Give doneness cues as well as times (e.g. "until golden and the internal
+  temperature reaches 165°F / 74°C").
+
+# Requirements from the user
+
+The user message lists the request and its constraints. Treat them as follows:
+- Servings and time limit: scale quantities to the servings asked for, and
+  keep the total time (prep plus cook) within the time limit.
+- Complexity: "Easy" means few ingredients and basic techniques, "Medium"
+  allows some multitasking or one new technique, and "Hard" or
+  "Show-stopping" may use advanced techniques and longer preparation.
+- Cooking method: when one is given, the main cooking step must use it.
+  One-pot or one-pan means a single vessel for cooking; slow cooker and
+  Instant Pot or pressure cooker recipes give the appliance setting and time;
+  air fryer recipes give temperature, time and when to shake or flip;
+  oven-baked, stovetop, grilled and microwave recipes use that heat source
+  for the main cooking; no-cook recipes use no heat at all.
+- Spice level and budget: match the requested heat level and keep
+  ingredients within the requested budget.
+- Leftover-friendly: when asked, choose dishes that reheat well and add
+  storage and reheating instructions to the tips.
+
+# Dietary restrictions and allergens
+
+Dietary restrictions and allergens are hard requirements, never suggestions:
+- Vegetarian: no meat, poultry, fish or seafood, and no gelatin or
+  meat-based stock.
+- Vegan: no animal products at all, including dairy, eggs, honey, gelatin
+  and fish sauce.
+- Pescatarian: fish and seafood are allowed; no meat or poultry.
+- Gluten-free: no wheat, barley, rye or regular soy sauce; use tamari or
+  certified gluten-free alternatives and say so in the ingredient list.
+- Dairy-free: no milk, butter, cream, cheese or yogurt.
+- Low carb and keto: avoid sugar, grains, starchy vegetables and legumes;
+  keto recipes should be high in fat and very low in carbohydrates.
+- Paleo: no grains, legumes, dairy or refined sugar.
+- Nut-free: no tree nuts or peanuts, including nut oils and nut butters.
+- For any listed allergen, leave out every ingredient that contains it,
+  including hidden sources (for example soy in many sauces, eggs in pasta
+  or mayonnaise, sesame in tahini), and never suggest it as an optional
+  garnish or substitution.
+If a requested dish cannot be made safely within the restrictions, adapt it
+and mention the change in one line of the tips.
+
+# Cooking from ingredients the user already has
+
+When the user lists ingredients they already have (typed in or identified
+from a photo of their fridge or pantry):
+- Build the recipe mainly around those ingredients.
+- If they allow additional ingredients, you may add a few common pantry
+  staples most kitchens have (oil, salt, pepper, basic dried spices, flour,
+  sugar, vinegar, stock). Otherwise use only the listed ingredients, plus
+  salt, pepper and oil.
+- In the ingredient list, mark each ingredient the user already has with
+  "(have)" and each ingredient they would need to buy with "(need to buy)".
+
+# Holidays and special occasions
+
+When the request is for a holiday or special occasion:
+- Draw on the traditions and flavors associated with that occasion, and make
+  the dish festive and appropriate for it.
+- Use the description under the recipe name to explain briefly why the
+  recipe is perfect for the occasion.
+- If it should be made ahead of time, add a make-ahead timeline to the tips.
+- If it should have a visually impressive presentation, add plating and
+  presentation suggestions to the tips.
+
+# Food safety
+
+- Cook poultry to 165°F / 74°C, ground meat to 160°F / 71°C, and whole cuts
+  of beef, pork and lamb to at least 145°F / 63°C followed by a short rest.
+- Cook fish until it flakes easily or reaches 145°F / 63°C.
+- Never suggest undercooked eggs, poultry or ground meat for children,
+  pregnant people or anyone with a weakened immune system without a warning.
+- Tell the user to refrigerate leftovers within two hours and say how many
+  days they keep.
+
+# Style
+
+Be warm but concise. Prefer clear, common techniques over restaurant jargon,
+explain any technique a beginner might not know in a few words, and make
+sure every ingredient in the list is used in the instructions.
+"""
+
+# Caps on the free text users type into a prompt, in tokens. Together they keep
+# the user message well under ~1500 tokens however much is pasted in.
+_INGREDIENTS_TOKEN_LIMIT = 400
+_NOTES_TOKEN_LIMIT = 150
+
+@st.cache_resource
+def _token_encoding():
+    """The gpt-4o tokenizer, or None without tiktoken (then ~4 characters per token)"""
+    try:
+        import tiktoken
+        return tiktoken.get_encoding("o200k_base")
+    except Exception:
+        # Not installed, or its encoding file couldn't be fetched
+        return None
+
+def _clip_tokens(text: str, limit: int, label: str) -> str:
+    """
+    Trim user text to at most about limit tokens, noting it on the page if trimmed
+
+    Lists are cut at the last whole comma-separated item.
+    """
+    encoding = _token_encoding()
+    if encoding is not None:
+        tokens = encoding.encode(text)
+        if len(tokens) <= limit:
+            return text
+        clipped = encoding.decode(tokens[:limit])
+    else:
+        if len(text) <= limit * 4:
+            return text
+        clipped = text[:limit * 4]
+
+    if "," in clipped:
+        clipped = clipped.rsplit(",", 1)[0]
+    st.caption(f"✂️ Your {label} was long, so only the first part was used.")
+    return clipped
+
+def _method_or_none(cooking_method: str):
+    """A cooking method choice as saved to the database ("Any method" is no method)"""
+    return cooking_method if cooking_method != "Any method" else None
+
+# How long a card button waits for a running prefetch before generating directly
+_PREFETCH_WAIT_SECONDS = 5
+
+@st.cache_resource
+def _prefetch_executor() -> ThreadPoolExecutor:
+    """Worker threads for card and shopping list prefetches, shared by all sessions"""
+    return ThreadPoolExecutor(max_workers=4, thread_name_prefix="prefetch")
+
+@lru_cache(maxsize=256)
+def _preference_clause(servings: int, time_limit: int, dietary: Tuple[str, ...],
+                       allergies: Tuple[str, ...], spice: str, budget: str,
+                       leftovers: bool) -> str:
+    """Sidebar preferences as prompt sentences, built once per combination"""
+    clause = f" The recipe should serve {servings} and take no more than {time_limit} minutes."
+
+    if dietary:
+        clause += f" It must be {', '.join(d.lower() for d in dietary)}."
+
+    if allergies:
+        clause += f" Avoid these allergens: {', '.join(a.lower() for a in allergies)}."
+
+    clause += f" Target a {spice.lower()} spice level."
+    clause += f" Keep ingredients within a {budget.lower()} budget."
+
+    if leftovers:
+        clause += " The recipe should be leftover-friendly and reheat well."
+
+    return clause
+
+@lru_cache(maxsize=256)
+def build_recipe_prompt(cuisine: str, meal_type: str, complexity: str,
+                        cooking_method: str, instructions: str) -> str:
+    """
+    Build the cuisine tab's recipe request (before sidebar preferences)
+
+    Pure, so repeat submissions with the same choices reuse the same string.
+
+    Args:
+        cuisine: Selected cuisine
+        meal_type: Selected meal type
+        complexity: Selected complexity
+        cooking_method: One of COOKING_METHODS
+        instructions: Free-text special instructions
+
+    Returns:
+        str: The recipe request
+    """
+    prompt = f"Suggest a {complexity.lower()} {cuisine.lower()} {meal_type.lower()} recipe"
+
+    if cooking_method != "Any method":
+        prompt += f" using {METHOD_MAPPING[cooking_method]}"
+
+    if instructions.strip():
+        prompt += f". Also, consider this: {instructions.strip()}"
+
+    return prompt
+
 class RecipeGenerator:
     """Handles recipe generation for all modes"""
 
-    def __init__(self):
-        """Initialize the recipe generator"""
-        self.client = get_openai_client()
+    @property
+    def client(self):
+        """The shared OpenAI client, created on first use rather than on page load"""
+        return get_openai_client()
 
     def encode_image(self, image) -> str:
         """
-        Encode image to base64
+        Downscale and encode image to base64 JPEG for the Vision API
+
+        Phone photos are shrunk to at most 768px on the long side, which keeps
+        the upload small without losing the detail needed to spot ingredients.
 
         Args:
             image: PIL Image object
@@ -37,30 +325,61 @@ class RecipeGenerator:
         Returns:
             str: Base64 encoded image
         """
+        # Pillow is only needed by the photo tab, so it is imported on first use
+        import io
+        from PIL import Image
+
+        # Work on a copy; thumbnail() resizes in place. JPEG has no alpha channel
+        image = image.convert("RGB")
+        image.thumbnail((768, 768), Image.LANCZOS)
         buffered = io.BytesIO()
-        image.save(buffered, format="JPEG")
+        image.save(buffered, format="JPEG", quality=80, optimize=True)
         return base64.b64encode(buffered.getvalue()).decode()
 
-    def generate_recipe(self, prompt: str, system_message: str = "You are a helpful chef assistant.") -> str:
+    def generate_recipe(self, prompt: str, system_message: str = CHEF_SYSTEM_PROMPT,
+                        similar_text: str = "", request: str = "", recipe_type: str = "",
+                        refresh: bool = False) -> str:
         """
         Generate a recipe using OpenAI
 
         Args:
             prompt: The recipe generation prompt
             system_message: System message for the AI
+            similar_text: The ingredient list in the prompt; a cached recipe for a
+                near-identical list may be reused
+            request: The rest of the prompt besides similar_text
+            recipe_type: Kind of recipe, so cached recipes are only reused within a tab
+            refresh: Always generate a new recipe instead of reusing a cached one
+
+        The recipe is streamed into the page as it is generated. Asking again
+        with the same prompt in one session generates a new recipe, since the
+        user evidently wants a different one.
 
         Returns:
             str: Generated recipe content
         """
+        messages = [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt}
+        ]
+        asked = st.session_state.setdefault('asked_recipe_prompts', set())
+        refresh = refresh or (system_message, prompt) in asked
+        asked.add((system_message, prompt))
         try:
-            response = self.client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": system_message},
-                    {"role": "user", "content": prompt}
-                ]
-            )
-            return response.choices[0].message.content
+            if similar_text:
+                chunks, tokens_saved = similar_chat_completion(
+                    self.client, similar_text, request,
+                    model=MODEL, messages=messages, stream=True,
+                    recipe_type=recipe_type, refresh=refresh, **_RECIPE_OPTIONS,
+                )
+            else:
+                chunks, tokens_saved = cached_chat_completion(
+                    self.client, model=MODEL, messages=messages, stream=True,
+                    refresh=refresh, **_RECIPE_OPTIONS,
+                )
+            if tokens_saved:
+                st.toast(f"⚡ Served from cache ({tokens_saved:,} tokens saved)")
+            return st.write_stream(chunks)
         except Exception as e:
             st.error(f"An error occurred: {e}")
             return ""
@@ -70,29 +389,16 @@ class RecipeGenerator:
         Append sidebar preferences (servings, time, dietary, allergies,
         spice, budget, leftovers) to any recipe prompt.
         """
-        servings = st.session_state.get('pref_servings', 4)
-        time_limit = st.session_state.get('pref_time_limit', 30)
-        dietary = st.session_state.get('pref_dietary', [])
-        allergies = st.session_state.get('pref_allergies', [])
-        spice = st.session_state.get('pref_spice_level', 'Medium')
-        budget = st.session_state.get('pref_budget', 'Medium')
-        leftovers = st.session_state.get('pref_include_leftovers', False)
-
-        prompt += f" The recipe should serve {servings} and take no more than {time_limit} minutes."
-
-        if dietary:
-            prompt += f" It must be {', '.join(d.lower() for d in dietary)}."
-
-        if allergies:
-            prompt += f" Avoid these allergens: {', '.join(a.lower() for a in allergies)}."
-
-        prompt += f" Target a {spice.lower()} spice level."
-        prompt += f" Keep ingredients within a {budget.lower()} budget."
-
-        if leftovers:
-            prompt += " The recipe should be leftover-friendly and reheat well."
-
-        return prompt
+        return prompt + _preference_clause(
+            st.session_state.get('pref_servings', 4),
+            st.session_state.get('pref_time_limit', 30),
+            # Sorted so the same selections always produce the same prompt text
+            tuple(sorted(st.session_state.get('pref_dietary', []))),
+            tuple(sorted(st.session_state.get('pref_allergies', []))),
+            st.session_state.get('pref_spice_level', 'Medium'),
+            st.session_state.get('pref_budget', 'Medium'),
+            st.session_state.get('pref_include_leftovers', False),
+        )
 
     def _get_dietary_tags(self) -> List[str]:
         """Return the current sidebar dietary tags for saving to the database."""
@@ -100,23 +406,60 @@ class RecipeGenerator:
 
     def generate_surprise_prompt(self) -> str:
         """Build a randomized recipe prompt using sidebar preferences."""
-        cuisines = [
-            "American", "Chinese", "French", "Greek", "Indian", "Italian",
-            "Japanese", "Korean", "Mediterranean", "Mexican", "Thai",
-            "Vietnamese", "Middle Eastern", "Southern/Soul Food"
-        ]
-        styles = [
-            "comfort food", "light and healthy", "quick weeknight",
-            "impressive date night", "family-friendly", "adventurous and bold",
-            "rustic and hearty", "elegant and refined"
-        ]
-        cuisine = random.choice(cuisines)
-        style = random.choice(styles)
+        cuisine = random.choice(_SURPRISE_CUISINES)
+        style = random.choice(_SURPRISE_STYLES)
 
         prompt = f"Surprise me with an amazing {cuisine} dinner recipe! Make it {style}."
-        prompt = self._append_preferences_to_prompt(prompt)
-        prompt += " Include ingredients and step-by-step instructions."
-        return prompt
+        return self._append_preferences_to_prompt(prompt)
+
+    def render_recipe_result(self, saved_recipes_manager, recipe_type: str, title: str,
+                             just_generated: bool, metadata: Dict[str, Any],
+                             available_ingredients: str = "") -> str:
+        """
+        Render a mode's stored recipe with its save button and output tools.
+
+        Args:
+            saved_recipes_manager: Manager used for the save button
+            recipe_type: Mode name; the recipe is read from st.session_state[f"{recipe_type}_recipe_content"]
+            title: Heading shown above the recipe
+            just_generated: True on the run that generated (and already streamed) the recipe;
+                leave False when generation failed, so the previous recipe is shown in full
+            metadata: Columns saved with the recipe besides the dietary tags
+            available_ingredients: Ingredients the user already has, for the shopping list
+
+        Returns:
+            str: The rendered recipe content, or "" when the mode has none yet
+        """
+        recipe_content = st.session_state.get(f"{recipe_type}_recipe_content")
+        if not recipe_content:
+            return ""
+
+        # A recipe generated on this run has already been streamed above
+        if not just_generated:
+            st.markdown(f"### {title}")
+            st.write(recipe_content)
+
+        st.markdown("---")
+
+        # Save button
+        if st.session_state.user:
+            saved_recipes_manager.render_save_button(
+                recipe_content,
+                recipe_type,
+                {**metadata, "dietary_tags": self._get_dietary_tags()},
+                f"save_{recipe_type}_recipe"
+            )
+            st.markdown("---")
+
+        # Shopping list and recipe card buttons
+        self.render_recipe_output(
+            recipe_content,
+            recipe_type,
+            f"{recipe_type}_shopping_list_btn",
+            f"{recipe_type}_recipe_card_btn",
+            available_ingredients
+        )
+        return recipe_content
 
     def render_recipe_output(self, recipe_content: str, recipe_type: str,
                            shopping_list_key: str, recipe_card_key: str,
@@ -125,22 +468,72 @@ class RecipeGenerator:
         Render recipe output with shopping list and recipe card buttons.
         Uses st.download_button for the recipe card to avoid popup-blocker issues.
         """
-        col1, col2 = st.columns(2)
+        # Card and list fetched ahead of time for this recipe, if any (see the end)
+        prefetch_key = f"{recipe_type}_prefetched"
+        prefetched = st.session_state.get(prefetch_key)
+        if prefetched and prefetched["source"] != (recipe_content, available_ingredients):
+            prefetched = None
+
+        def take_prefetched(wait: float = 0):
+            """The prefetched (card, list) if ready within wait seconds; None if absent, late or failed"""
+            if not prefetched:
+                return None
+            future = prefetched["future"]
+            if future.cancelled():
+                return None
+            try:
+                recipe_card, shopping_list = future.result(timeout=wait)
+            except FutureTimeoutError:
+                # The pool is shared by all sessions, so don't queue behind
+                # other users; a prefetch that hasn't started is dropped
+                future.cancel()
+                return None
+            if recipe_card.startswith("Error generating"):
+                return None
+            return recipe_card, shopping_list
+
+        batch_mode = st.session_state.get('pref_batch_extras', False)
+        if batch_mode:
+            stream_list = False
+            self._render_batch_controls(recipe_content, recipe_type, available_ingredients)
+        else:
+            col1, col2, col3 = st.columns(3)
 
-        with col1:
-            if st.button("🛒 Generate Shopping List", key=shopping_list_key):
-                with st.spinner("Creating your shopping list..."):
-                    shopping_list = generate_shopping_list(recipe_content, available_ingredients)
-                    st.session_state[f"{recipe_type}_shopping_list"] = shopping_list
+            with col1:
+                # Streamed below, where the list is displayed, unless the
+                # prefetch has already finished
+                stream_list = st.button("🛒 Generate Shopping List", key=shopping_list_key)
+                if stream_list and (extras := take_prefetched()):
+                    st.session_state[f"{recipe_type}_shopping_list"] = extras[1]
+                    stream_list = False
 
-        with col2:
-            if st.button("🖨️ Create Recipe Card", key=recipe_card_key):
-                with st.spinner("Creating your recipe card..."):
-                    recipe_card = generate_recipe_card(recipe_content)
+            with col2:
+                if st.button("🖨️ Create Recipe Card", key=recipe_card_key):
+                    if extras := take_prefetched(_PREFETCH_WAIT_SECONDS):
+                        st.session_state[f"{recipe_type}_recipe_card"] = extras[0]
+                    else:
+                        with st.spinner("Creating your recipe card..."):
+                            recipe_card = generate_recipe_card(recipe_content)
+                            st.session_state[f"{recipe_type}_recipe_card"] = recipe_card
+
+            with col3:
+                # One request for both, instead of two back-to-back calls
+                if st.button("🛒🖨️ Get Both", key=f"{recipe_type}_card_and_list_btn"):
+                    if extras := take_prefetched(_PREFETCH_WAIT_SECONDS):
+                        recipe_card, shopping_list = extras
+                    else:
+                        with st.spinner("Creating your shopping list and recipe card..."):
+                            recipe_card, shopping_list = generate_card_and_list(recipe_content, available_ingredients)
                     st.session_state[f"{recipe_type}_recipe_card"] = recipe_card
+                    st.session_state[f"{recipe_type}_shopping_list"] = shopping_list
 
-        # Display shopping list if it exists
-        if st.session_state.get(f"{recipe_type}_shopping_list"):
+        # Display shopping list, streaming it in as it is generated
+        if stream_list:
+            st.markdown("### 🛒 Smart Shopping List")
+            st.session_state[f"{recipe_type}_shopping_list"] = st.write_stream(
+                stream_shopping_list(recipe_content, available_ingredients)
+            )
+        elif st.session_state.get(f"{recipe_type}_shopping_list"):
             st.markdown("### 🛒 Smart Shopping List")
             st.write(st.session_state[f"{recipe_type}_shopping_list"])
 
@@ -217,6 +610,58 @@ class RecipeGenerator:
         with st.expander("📋 Copy Recipe Text"):
             st.code(recipe_content, language=None)
 
+        # Start fetching the card and list (one call) in the background as soon
+        # as the recipe is on screen; the buttons above pick up the result
+        if prefetched is None and not batch_mode and st.session_state.get('pref_prefetch_extras', False):
+            st.session_state[prefetch_key] = {
+                "source": (recipe_content, available_ingredients),
+                "future": _prefetch_executor().submit(
+                    generate_card_and_list, recipe_content, available_ingredients
+                ),
+            }
+
+    def _render_batch_controls(self, recipe_content: str, recipe_type: str,
+                               available_ingredients: str):
+        """
+        Queue the shopping list and recipe card on the Batch API (half price,
+        up to 24 hours) and collect them later, in place of the instant buttons.
+        """
+        pending_key = f"{recipe_type}_pending_batch"
+        source = (recipe_content, available_ingredients)
+        pending = st.session_state.get(pending_key)
+        if pending and pending["source"] != source:
+            pending = None  # Queued for an earlier recipe
+
+        col1, col2 = st.columns(2)
+
+        with col1:
+            if st.button("🕒 Queue Shopping List & Card", key=f"{recipe_type}_batch_btn",
+                         disabled=pending is not None,
+                         help="Half the API cost; results can take up to 24 hours."):
+                try:
+                    batch_id = submit_card_and_list_batch(recipe_content, available_ingredients)
+                    st.session_state[pending_key] = {"id": batch_id, "source": source}
+                    st.success("Queued! Use 'Refresh pending results' to check on it.")
+                except Exception as e:
+                    st.error(f"Error queueing batch: {e}")
+
+        with col2:
+            if st.button("🔄 Refresh pending results", key=f"{recipe_type}_batch_refresh_btn",
+                         disabled=pending is None):
+                try:
+                    result = fetch_card_and_list_batch(pending["id"])
+                    if result is None:
+                        st.info("Still processing, check back later.")
+                    else:
+                        recipe_card, shopping_list = result
+                        st.session_state[f"{recipe_type}_recipe_card"] = recipe_card
+                        st.session_state[f"{recipe_type}_shopping_list"] = shopping_list
+                        del st.session_state[pending_key]
+                except Exception as e:
+                    del st.session_state[pending_key]
+                    st.error(f"Error fetching batch results: {e}")
+
+    @st.fragment
     def render_cuisine_tab(self, saved_recipes_manager):
         """Render the cuisine-based recipe generation tab"""
         st.header("Find Recipe by Cuisine & Preferences")
@@ -248,77 +693,38 @@ class RecipeGenerator:
         with col2:
             cooking_method = st.selectbox(
                 "Preferred cooking method:",
-                ["Any method", "One-pot/One-pan", "Slow cooker", "Air fryer",
-                 "Instant Pot/Pressure cooker", "Oven/Baking", "Stovetop",
-                 "Grilling", "No-cook/Raw", "Microwave"]
+                COOKING_METHODS
             )
 
         # Special instructions
         instructions = st.text_input("Any other special instructions or preferences?")
 
         # Submit button
+        just_generated = False
         if st.button("Suggest Recipe", key="cuisine_recipe"):
-            prompt = f"Suggest a {complexity.lower()} {cuisine.lower()} {meal_type.lower()} recipe"
-
-            if cooking_method != "Any method":
-                method_mapping = {
-                    "One-pot/One-pan": "one-pot or one-pan",
-                    "Slow cooker": "slow cooker",
-                    "Air fryer": "air fryer",
-                    "Instant Pot/Pressure cooker": "Instant Pot or pressure cooker",
-                    "Oven/Baking": "oven-baked",
-                    "Stovetop": "stovetop",
-                    "Grilling": "grilled",
-                    "No-cook/Raw": "no-cook",
-                    "Microwave": "microwave"
-                }
-                prompt += f" using {method_mapping[cooking_method]}"
-
-            if instructions:
-                prompt += f". Also, consider this: {instructions}"
-
+            instructions = _clip_tokens(instructions, _NOTES_TOKEN_LIMIT, "instructions")
+            prompt = build_recipe_prompt(cuisine, meal_type, complexity, cooking_method, instructions)
             prompt = self._append_preferences_to_prompt(prompt)
-            prompt += " Include ingredients and step-by-step instructions."
 
+            st.markdown("### Suggested Recipe")
             recipe_content = self.generate_recipe(prompt)
+            just_generated = bool(recipe_content)
             if recipe_content:
                 st.session_state.cuisine_recipe_content = recipe_content
                 st.session_state.cuisine_shopping_list = ""
 
         # Display recipe if it exists
-        if st.session_state.cuisine_recipe_content:
-            st.markdown("### Suggested Recipe")
-            st.write(st.session_state.cuisine_recipe_content)
-
-            st.markdown("---")
-
-            # Save button
-            if st.session_state.user:
-                metadata = {
-                    "cuisine": cuisine,
-                    "meal_type": meal_type,
-                    "complexity": complexity,
-                    "occasion": None,
-                    "cooking_method": cooking_method if cooking_method != "Any method" else None,
-                    "dietary_tags": self._get_dietary_tags()
-                }
-
-                saved_recipes_manager.render_save_button(
-                    st.session_state.cuisine_recipe_content,
-                    "cuisine",
-                    metadata,
-                    "save_cuisine_recipe"
-                )
-                st.markdown("---")
-
-            # Shopping list and recipe card buttons
-            self.render_recipe_output(
-                st.session_state.cuisine_recipe_content,
-                "cuisine",
-                "cuisine_shopping_list_btn",
-                "cuisine_recipe_card_btn"
-            )
+        self.render_recipe_result(
+            saved_recipes_manager, "cuisine", "Suggested Recipe", just_generated,
+            {
+                "cuisine": cuisine,
+                "meal_type": meal_type,
+                "complexity": complexity,
+                "cooking_method": _method_or_none(cooking_method),
+            }
+        )
 
+    @st.fragment
     def render_fridge_tab(self, saved_recipes_manager):
         """Render the fridge-based recipe generation tab"""
         st.header("Find Recipe by What's in Your Fridge")
@@ -352,9 +758,7 @@ class RecipeGenerator:
         with col2:
             fridge_cooking_method = st.selectbox(
                 "Preferred cooking method:",
-                ["Any method", "One-pot/One-pan", "Slow cooker", "Air fryer",
-                 "Instant Pot/Pressure cooker", "Oven/Baking", "Stovetop",
-                 "Grilling", "No-cook/Raw", "Microwave"],
+                COOKING_METHODS,
                 key="fridge_cooking_method"
             )
 
@@ -370,40 +774,33 @@ class RecipeGenerator:
         )
 
         # Submit button
+        just_generated = False
         if st.button("Find Recipe with My Ingredients", key="fridge_recipe"):
             if not fridge_items.strip():
                 st.warning("Please enter at least some ingredients from your fridge!")
             else:
-                prompt = f"I have these ingredients available: {fridge_items}. "
-                prompt += f"Please suggest a {fridge_complexity.lower()} {fridge_meal_type.lower()} recipe"
+                fridge_items = _clip_tokens(fridge_items, _INGREDIENTS_TOKEN_LIMIT, "ingredient list")
+                fridge_instructions = _clip_tokens(fridge_instructions, _NOTES_TOKEN_LIMIT, "instructions")
+                request = f"Please suggest a {fridge_complexity.lower()} {fridge_meal_type.lower()} recipe"
 
                 if fridge_cooking_method != "Any method":
-                    method_mapping = {
-                        "One-pot/One-pan": "one-pot or one-pan",
-                        "Slow cooker": "slow cooker",
-                        "Air fryer": "air fryer",
-                        "Instant Pot/Pressure cooker": "Instant Pot or pressure cooker",
-                        "Oven/Baking": "oven-baked",
-                        "Stovetop": "stovetop",
-                        "Grilling": "grilled",
-                        "No-cook/Raw": "no-cook",
-                        "Microwave": "microwave"
-                    }
-                    prompt += f" using {method_mapping[fridge_cooking_method]}"
+                    request += f" using {METHOD_MAPPING[fridge_cooking_method]}"
 
                 if allow_additional:
-                    prompt += ". You can suggest recipes that use most of these ingredients and may require a few common pantry staples (like oil, salt, pepper, basic spices) that most people have."
+                    request += ". Additional common pantry staples are allowed."
                 else:
-                    prompt += ". Please try to use primarily the ingredients I've listed."
+                    request += ". Use only the ingredients I've listed."
 
-                if fridge_instructions:
-                    prompt += f" Also consider: {fridge_instructions}"
+                if fridge_instructions.strip():
+                    request += f" Also consider: {fridge_instructions.strip()}"
 
-                prompt = self._append_preferences_to_prompt(prompt)
-                prompt += " Include a complete ingredient list (highlighting what I already have vs. what I might need to get) and step-by-step cooking instructions."
-
-                system_msg = "You are a helpful chef assistant who specializes in creating recipes based on available ingredients. Always clearly indicate which ingredients the user already has vs. which they might need to purchase."
-                recipe_content = self.generate_recipe(prompt, system_msg)
+                request = self._append_preferences_to_prompt(request)
+                prompt = f"I have these ingredients available: {fridge_items}. {request}"
+                st.markdown("### Recipe Based on Your Ingredients")
+                recipe_content = self.generate_recipe(
+                    prompt, similar_text=fridge_items, request=request, recipe_type="fridge"
+                )
+                just_generated = bool(recipe_content)
 
                 if recipe_content:
                     st.session_state.fridge_recipe_content = recipe_content
@@ -411,42 +808,18 @@ class RecipeGenerator:
                     # Store the fridge items for shopping list generation
                     st.session_state.fridge_items_current = fridge_items
 
-        # Display recipe if it exists
-        if st.session_state.fridge_recipe_content:
-            st.markdown("### Recipe Based on Your Ingredients")
-            st.write(st.session_state.fridge_recipe_content)
-
-            st.markdown("---")
-
-            # Save button
-            if st.session_state.user:
-                metadata = {
-                    "cuisine": None,
-                    "meal_type": fridge_meal_type,
-                    "complexity": fridge_complexity,
-                    "occasion": None,
-                    "cooking_method": fridge_cooking_method if fridge_cooking_method != "Any method" else None,
-                    "dietary_tags": self._get_dietary_tags()
-                }
-
-                saved_recipes_manager.render_save_button(
-                    st.session_state.fridge_recipe_content,
-                    "fridge",
-                    metadata,
-                    "save_fridge_recipe"
-                )
-                st.markdown("---")
-
-            # Shopping list and recipe card buttons with available ingredients
-            available_ingredients = st.session_state.get('fridge_items_current', fridge_items)
-            self.render_recipe_output(
-                st.session_state.fridge_recipe_content,
-                "fridge",
-                "fridge_shopping_list_btn",
-                "fridge_recipe_card_btn",
-                available_ingredients
-            )
+        # Display recipe if it exists, with available ingredients for the shopping list
+        self.render_recipe_result(
+            saved_recipes_manager, "fridge", "Recipe Based on Your Ingredients", just_generated,
+            {
+                "meal_type": fridge_meal_type,
+                "complexity": fridge_complexity,
+                "cooking_method": _method_or_none(fridge_cooking_method),
+            },
+            st.session_state.get('fridge_items_current', fridge_items)
+        )
 
+    @st.fragment
     def render_photo_tab(self, saved_recipes_manager):
         """Render the photo-based recipe generation tab"""
         st.header("Photo Recipe Finder")
@@ -476,43 +849,57 @@ class RecipeGenerator:
 
             # Button to analyze the photo
             if st.button("🔍 Identify Ingredients in Photo", key="analyze_photo"):
-                with st.spinner("Analyzing your photo..."):
-                    try:
-                        # Convert the image to PIL format
-                        image = Image.open(photo)
-
-                        # Encode image to base64
-                        base64_image = self.encode_image(image)
-
-                        # Make request to OpenAI Vision API
-                        response = self.client.chat.completions.create(
-                            model="gpt-4o",
-                            messages=[
-                                {
-                                    "role": "user",
-                                    "content": [
-                                        {
-                                            "type": "text",
-                                            "text": "Please identify all the food ingredients, items, and products you can see in this image. List them as a comma-separated list. Focus on ingredients that could be used for cooking. Include fresh produce, packaged goods, dairy products, meats, spices, condiments, etc. Be specific about types (e.g., 'red bell peppers' instead of just 'peppers'). Only list food items that are clearly visible and identifiable."
-                                        },
-                                        {
-                                            "type": "image_url",
-                                            "image_url": {
-                                                "url": f"data:image/jpeg;base64,{base64_image}"
+                # Repeat clicks on the same photo skip decoding, encoding and the API
+                photo_hash = hashlib.sha256(photo.getvalue()).hexdigest()
+                if photo_hash in st.session_state.photo_analysis_cache:
+                    st.session_state.identified_ingredients = st.session_state.photo_analysis_cache[photo_hash]
+                    st.success("Ingredients identified!")
+                else:
+                    with st.spinner("Analyzing your photo..."):
+                        try:
+                            # Convert the image to PIL format
+                            from PIL import Image
+                            image = Image.open(photo)
+
+                            # Encode image to base64
+                            base64_image = self.encode_image(image)
+
+                            # Make request to OpenAI Vision API
+                            # The key covers the encoded image, so re-analyzing the same photo is free
+                            identified, tokens_saved = cached_chat_completion(
+                                self.client,
+                                model="gpt-4o",
+                                messages=[
+                                    {
+                                        "role": "user",
+                                        "content": [
+                                            {
+                                                "type": "text",
+                                                "text": _PHOTO_ANALYSIS_PROMPT
+                                            },
+                                            {
+                                                "type": "image_url",
+                                                "image_url": {
+                                                    "url": f"data:image/jpeg;base64,{base64_image}",
+                                                    # Low detail is plenty for naming ingredients
+                                                    "detail": "low"
+                                                }
                                             }
-                                        }
-                                    ]
-                                }
-                            ],
-                            max_tokens=500
-                        )
-
-                        # Store identified ingredients in session state
-                        st.session_state.identified_ingredients = response.choices[0].message.content
-                        st.success("Ingredients identified!")
-
-                    except Exception as e:
-                        st.error(f"Error analyzing image: {e}")
+                                        ]
+                                    }
+                                ],
+                                max_tokens=500
+                            )
+
+                            # Store identified ingredients in session state
+                            st.session_state.identified_ingredients = identified
+                            st.session_state.photo_analysis_cache[photo_hash] = identified
+                            if tokens_saved:
+                                st.toast(f"⚡ Served from cache ({tokens_saved:,} tokens saved)")
+                            st.success("Ingredients identified!")
+
+                        except Exception as e:
+                            st.error(f"Error analyzing image: {e}")
 
         # Display and allow editing of identified ingredients
         if st.session_state.identified_ingredients:
@@ -548,9 +935,7 @@ class RecipeGenerator:
             with col2:
                 photo_cooking_method = st.selectbox(
                     "Preferred cooking method:",
-                    ["Any method", "One-pot/One-pan", "Slow cooker", "Air fryer",
-                     "Instant Pot/Pressure cooker", "Oven/Baking", "Stovetop",
-                     "Grilling", "No-cook/Raw", "Microwave"],
+                    COOKING_METHODS,
                     key="photo_cooking_method"
                 )
 
@@ -567,84 +952,51 @@ class RecipeGenerator:
             )
 
             # Generate recipe button
+            just_generated = False
             if st.button("🍳 Generate Recipe from Photo", key="photo_recipe"):
                 if not photo_ingredients.strip():
                     st.warning("Please make sure there are ingredients listed above!")
                 else:
-                    prompt = f"Based on these ingredients I have from my photo: {photo_ingredients}. "
-                    prompt += f"Please suggest a {photo_complexity.lower()} {photo_meal_type.lower()} recipe"
+                    photo_ingredients = _clip_tokens(photo_ingredients, _INGREDIENTS_TOKEN_LIMIT, "ingredient list")
+                    photo_instructions = _clip_tokens(photo_instructions, _NOTES_TOKEN_LIMIT, "instructions")
+                    request = f"Please suggest a {photo_complexity.lower()} {photo_meal_type.lower()} recipe"
 
                     if photo_cooking_method != "Any method":
-                        method_mapping = {
-                            "One-pot/One-pan": "one-pot or one-pan",
-                            "Slow cooker": "slow cooker",
-                            "Air fryer": "air fryer",
-                            "Instant Pot/Pressure cooker": "Instant Pot or pressure cooker",
-                            "Oven/Baking": "oven-baked",
-                            "Stovetop": "stovetop",
-                            "Grilling": "grilled",
-                            "No-cook/Raw": "no-cook",
-                            "Microwave": "microwave"
-                        }
-                        prompt += f" using {method_mapping[photo_cooking_method]}"
+                        request += f" using {METHOD_MAPPING[photo_cooking_method]}"
 
                     if photo_allow_additional:
-                        prompt += ". You can suggest recipes that use most of these ingredients and may require a few common pantry staples (like oil, salt, pepper, basic spices) that most people have."
+                        request += ". Additional common pantry staples are allowed."
                     else:
-                        prompt += ". Please try to use primarily the ingredients I've identified from my photo."
-
-                    if photo_instructions:
-                        prompt += f" Also consider: {photo_instructions}"
-
-                    prompt = self._append_preferences_to_prompt(prompt)
-                    prompt += " Include a complete ingredient list (highlighting what I already have from the photo vs. what I might need to get) and step-by-step cooking instructions."
+                        request += ". Use only the ingredients identified from my photo."
 
-                    system_msg = "You are a helpful chef assistant who specializes in creating recipes based on ingredients identified from photos. Always clearly indicate which ingredients the user already has vs. which they might need to purchase."
+                    if photo_instructions.strip():
+                        request += f" Also consider: {photo_instructions.strip()}"
 
-                    with st.spinner("Creating your recipe..."):
-                        recipe_content = self.generate_recipe(prompt, system_msg)
-
-                        if recipe_content:
-                            st.session_state.photo_recipe_content = recipe_content
-                            st.session_state.photo_shopping_list = ""
-                            # Store the photo ingredients for shopping list generation
-                            st.session_state.photo_ingredients_current = photo_ingredients
-
-            # Display recipe if it exists
-            if st.session_state.photo_recipe_content:
-                st.markdown("### Recipe Based on Your Photo")
-                st.write(st.session_state.photo_recipe_content)
-
-                st.markdown("---")
+                    request = self._append_preferences_to_prompt(request)
+                    prompt = f"Based on these ingredients I have from my photo: {photo_ingredients}. {request}"
 
-                # Save button
-                if st.session_state.user:
-                    metadata = {
-                        "cuisine": None,
-                        "meal_type": photo_meal_type,
-                        "complexity": photo_complexity,
-                        "occasion": None,
-                        "cooking_method": photo_cooking_method if photo_cooking_method != "Any method" else None,
-                        "dietary_tags": self._get_dietary_tags()
-                    }
-
-                    saved_recipes_manager.render_save_button(
-                        st.session_state.photo_recipe_content,
-                        "photo",
-                        metadata,
-                        "save_photo_recipe"
+                    st.markdown("### Recipe Based on Your Photo")
+                    recipe_content = self.generate_recipe(
+                        prompt, similar_text=photo_ingredients, request=request, recipe_type="photo"
                     )
-                    st.markdown("---")
-
-                # Shopping list and recipe card buttons with photo ingredients
-                available_ingredients = st.session_state.get('photo_ingredients_current', photo_ingredients)
-                self.render_recipe_output(
-                    st.session_state.photo_recipe_content,
-                    "photo",
-                    "photo_shopping_list_btn",
-                    "photo_recipe_card_btn",
-                    available_ingredients
-                )
+                    just_generated = bool(recipe_content)
+
+                    if recipe_content:
+                        st.session_state.photo_recipe_content = recipe_content
+                        st.session_state.photo_shopping_list = ""
+                        # Store the photo ingredients for shopping list generation
+                        st.session_state.photo_ingredients_current = photo_ingredients
+
+            # Display recipe if it exists, with photo ingredients for the shopping list
+            self.render_recipe_result(
+                saved_recipes_manager, "photo", "Recipe Based on Your Photo", just_generated,
+                {
+                    "meal_type": photo_meal_type,
+                    "complexity": photo_complexity,
+                    "cooking_method": _method_or_none(photo_cooking_method),
+                },
+                st.session_state.get('photo_ingredients_current', photo_ingredients)
+            )
 
         else:
             st.info("Take a photo or upload an image of your ingredients to get started!")
@@ -656,6 +1008,7 @@ class RecipeGenerator:
             - Take the photo from a good angle where items are recognizable
             """)
 
+    @st.fragment
     def render_holiday_tab(self, saved_recipes_manager, holiday_name: str, holiday_desc: str):
         """Render the holiday/occasion recipe generation tab"""
         st.header("Holiday & Special Occasion Recipes")
@@ -719,15 +1072,10 @@ class RecipeGenerator:
 
         col3, col4 = st.columns(2)
 
-        with col3:
-            make_ahead = st.checkbox("Can be made ahead of time", value=False)
-            crowd_pleaser = st.checkbox("Crowd-pleaser (appeals to most tastes)", value=True)
-            budget_friendly = st.checkbox("Budget-friendly", value=False)
-
-        with col4:
-            impressive = st.checkbox("Visually impressive presentation", value=False)
-            traditional = st.checkbox("Traditional/Classic recipe", value=False)
-            modern_twist = st.checkbox("Modern twist on classic", value=False)
+        requirements = {}
+        for i, (key, label, default, _) in enumerate(SPECIAL_REQUIREMENTS):
+            with (col3 if i < 3 else col4):
+                requirements[key] = st.checkbox(label, value=default)
 
         # Additional preferences
         occasion_notes = st.text_area(
@@ -737,77 +1085,37 @@ class RecipeGenerator:
         )
 
         # Generate holiday recipe
+        just_generated = False
         if st.button("Get Holiday Recipe Suggestions", key="occasion_recipe_btn"):
-            special_reqs = []
-            if make_ahead: special_reqs.append("can be made ahead of time")
-            if crowd_pleaser: special_reqs.append("crowd-pleaser that appeals to most tastes")
-            if budget_friendly: special_reqs.append("budget-friendly")
-            if impressive: special_reqs.append("visually impressive presentation")
-            if traditional: special_reqs.append("traditional/classic recipe")
-            if modern_twist: special_reqs.append("modern twist on a classic")
+            special_reqs = [phrase for key, _, _, phrase in SPECIAL_REQUIREMENTS if requirements[key]]
+            occasion_notes = _clip_tokens(occasion_notes, _NOTES_TOKEN_LIMIT, "theme")
 
             prompt = f"Suggest a {occasion_complexity.lower()} {occasion_meal_type.lower()} recipe perfect for {selected_occasion} "
-            prompt += f"in a {occasion_serving_style.lower()} style. "
+            prompt += f"in a {occasion_serving_style.lower()} style."
 
             if special_reqs:
-                prompt += f"Important: The recipe should be {', '.join(special_reqs)}. "
+                prompt += f" Important: The recipe should be {', '.join(special_reqs)}."
 
             if occasion_notes:
-                prompt += f"Additional theme/request: {occasion_notes}. "
-
-            prompt += f"Make sure the recipe is festive and appropriate for {selected_occasion}. "
+                prompt += f" Additional theme/request: {occasion_notes}."
 
             prompt = self._append_preferences_to_prompt(prompt)
 
-            prompt += " Include a brief introduction explaining why this recipe is perfect for the occasion, "
-            prompt += "then provide the full ingredient list and step-by-step instructions. "
-
-            if make_ahead:
-                prompt += "Include make-ahead instructions and timeline. "
-
-            if impressive:
-                prompt += "Include plating/presentation suggestions. "
-
-            system_msg = f"You are a helpful chef assistant who specializes in creating festive recipes for holidays and special occasions. You understand the traditions and flavors associated with {selected_occasion}."
-
-            with st.spinner(f"Creating the perfect recipe for {selected_occasion}..."):
-                recipe_content = self.generate_recipe(prompt, system_msg)
-
-                if recipe_content:
-                    st.session_state.occasion_recipe_content = recipe_content
-                    st.session_state.occasion_shopping_list = ""
-                    st.session_state.occasion_recipe_card = ""
-
-        # Display recipe if it exists
-        if st.session_state.occasion_recipe_content:
             st.markdown(f"### {selected_occasion} Recipe")
-            st.write(st.session_state.occasion_recipe_content)
-
-            st.markdown("---")
+            recipe_content = self.generate_recipe(prompt)
+            just_generated = bool(recipe_content)
 
-            # Save button
-            if st.session_state.user:
-                metadata = {
-                    "cuisine": None,
-                    "meal_type": occasion_meal_type,
-                    "complexity": occasion_complexity,
-                    "occasion": selected_occasion,
-                    "cooking_method": None,
-                    "dietary_tags": self._get_dietary_tags()
-                }
-
-                saved_recipes_manager.render_save_button(
-                    st.session_state.occasion_recipe_content,
-                    "occasion",
-                    metadata,
-                    "save_occasion_recipe"
-                )
-                st.markdown("---")
+            if recipe_content:
+                st.session_state.occasion_recipe_content = recipe_content
+                st.session_state.occasion_shopping_list = ""
+                st.session_state.occasion_recipe_card = ""
 
-            # Shopping list and recipe card buttons
-            self.render_recipe_output(
-                st.session_state.occasion_recipe_content,
-                "occasion",
-                "occasion_shopping_list_btn",
-                "occasion_recipe_card_btn"
-            )
+        # Display recipe if it exists
+        self.render_recipe_result(
+            saved_recipes_manager, "occasion", f"{selected_occasion} Recipe", just_generated,
+            {
+                "meal_type": occasion_meal_type,
+                "complexity": occasion_complexity,
+                "occasion": selected_occasion,
+            }
+        )
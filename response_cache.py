@@ -0,0 +1,293 @@
+"""
+Response Cache Module
+Caches OpenAI chat completions on disk so identical (or, for ingredient-based
+prompts, near-identical) requests skip the API
+"""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from functools import partial
+import orjson
+import streamlit as st
+from pathlib import Path
+from typing import TYPE_CHECKING, Any, Callable, Dict, Iterator, List, Optional, Tuple, Union
+
+if TYPE_CHECKING:
+    import numpy as np
+
+CACHE_DIR = Path.home() / ".recipe_app_cache"
+_CACHE_TTL_SECONDS = 7 * 24 * 60 * 60  # 7 days
+
+# Request options that don't change the generated text, left out of the key
+_UNKEYED_OPTIONS = ("extra_body", "timeout")
+
+# Responses also kept in session state for repeat clicks, skipping the database
+_SESSION_CACHE_TTL_SECONDS = 30 * 60
+_SESSION_CACHE_MAX_ENTRIES = 32
+
+# Expired rows are deleted on write, at most this often
+_PRUNE_INTERVAL_SECONDS = 60 * 60
+
+# Near-duplicate ingredient lists above this cosine similarity share a response
+SIMILARITY_THRESHOLD = 0.92
+_EMBEDDING_MODEL = "text-embedding-3-small"
+
+# One connection is shared by every session's script thread
+_db_lock = threading.Lock()
+_last_prune = 0.0
+
+@st.cache_resource
+def _get_connection() -> sqlite3.Connection:
+    """Open the cache database (once per process), creating it if needed"""
+    CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(CACHE_DIR / "responses.sqlite3", check_same_thread=False)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS cache ("
+        "key TEXT PRIMARY KEY, response TEXT NOT NULL, "
+        "tokens INTEGER NOT NULL, created_at REAL NOT NULL)"
+    )
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS semantic_cache ("
+        "namespace TEXT NOT NULL, embedding BLOB NOT NULL, response TEXT NOT NULL, "
+        "tokens INTEGER NOT NULL, created_at REAL NOT NULL)"
+    )
+    conn.execute("CREATE INDEX IF NOT EXISTS semantic_cache_namespace ON semantic_cache (namespace)")
+    conn.commit()
+    return conn
+
+def _cache_key(model: str, messages: List[Dict[str, Any]], options: Dict[str, Any]) -> str:
+    """Hash everything that determines the response into a cache key"""
+    keyed = {k: v for k, v in options.items() if k not in _UNKEYED_OPTIONS}
+    payload = orjson.dumps({"model": model, "messages": messages, "options": keyed}, option=orjson.OPT_SORT_KEYS)
+    return hashlib.sha256(payload).hexdigest()
+
+def _session_cache() -> Dict[str, Tuple[str, int, float]]:
+    """This session's key -> (response, tokens, created_at) map"""
+    return st.session_state.setdefault('_resp_cache', {})
+
+def _remember(key: str, response: str, tokens: int):
+    """Keep a response in the session cache, evicting stale and oldest entries"""
+    cache = _session_cache()
+    cutoff = time.time() - _SESSION_CACHE_TTL_SECONDS
+    for stale in [k for k, entry in cache.items() if entry[2] <= cutoff]:
+        del cache[stale]
+    cache.pop(key, None)
+    cache[key] = (response, tokens, time.time())
+    while len(cache) > _SESSION_CACHE_MAX_ENTRIES:
+        del cache[next(iter(cache))]
+
+def _prune_expired(conn: sqlite3.Connection):
+    """Delete expired rows from both tables; call with _db_lock held"""
+    global _last_prune
+    now = time.time()
+    if now - _last_prune < _PRUNE_INTERVAL_SECONDS:
+        return
+    _last_prune = now
+    conn.execute("DELETE FROM cache WHERE created_at <= ?", (now - _CACHE_TTL_SECONDS,))
+    conn.execute("DELETE FROM semantic_cache WHERE created_at <= ?", (now - _CACHE_TTL_SECONDS,))
+
+def _lookup(key: str) -> Optional[Tuple[str, int]]:
+    """Return (response, tokens) for a fresh cache entry, or None"""
+    entry = _session_cache().get(key)
+    if entry and entry[2] > time.time() - _SESSION_CACHE_TTL_SECONDS:
+        return entry[0], entry[1]
+
+    with _db_lock:
+        row = _get_connection().execute(
+            "SELECT response, tokens FROM cache WHERE key = ? AND created_at > ?",
+            (key, time.time() - _CACHE_TTL_SECONDS),
+        ).fetchone()
+    if row is not None:
+        _remember(key, row[0], row[1])
+    return row
+
+def _store(key: str, response: str, tokens: int):
+    """Save a response, replacing any earlier entry with the same key"""
+    _remember(key, response, tokens)
+    with _db_lock:
+        conn = _get_connection()
+        _prune_expired(conn)
+        conn.execute(
+            "INSERT OR REPLACE INTO cache (key, response, tokens, created_at) VALUES (?, ?, ?, ?)",
+            (key, response, tokens, time.time()),
+        )
+        conn.commit()
+
+def _record_saving(tokens: int):
+    """Add a cache hit's tokens to this session's running total"""
+    st.session_state.llm_tokens_saved = st.session_state.get('llm_tokens_saved', 0) + tokens
+
+def _create_and_store(client, key: str, model: str, messages: List[Dict[str, Any]],
+                      options: Dict[str, Any]) -> Tuple[str, int]:
+    """Call the API and save the response under key; returns (response, tokens used)"""
+    response = client.chat.completions.create(model=model, messages=messages, **options)
+    content = response.choices[0].message.content
+    tokens = response.usage.total_tokens if response.usage else 0
+    try:
+        _store(key, content, tokens)
+    except (sqlite3.Error, OSError):
+        pass  # A read-only or full disk shouldn't break generation
+    return content, tokens
+
+def _stream_and_store(client, key: str, model: str, messages: List[Dict[str, Any]],
+                      options: Dict[str, Any],
+                      on_complete: Optional[Callable[[str, int], None]] = None) -> Iterator[str]:
+    """Stream the API response, saving it under key once it has finished"""
+    stream = client.chat.completions.create(
+        model=model, messages=messages, stream=True,
+        stream_options={"include_usage": True}, **options
+    )
+    parts = []
+    tokens = 0
+    for chunk in stream:
+        if chunk.usage:
+            tokens = chunk.usage.total_tokens
+        if chunk.choices and chunk.choices[0].delta.content:
+            parts.append(chunk.choices[0].delta.content)
+            yield chunk.choices[0].delta.content
+    content = "".join(parts)
+    try:
+        _store(key, content, tokens)
+        if on_complete:
+            on_complete(content, tokens)
+    except (sqlite3.Error, OSError):
+        pass
+
+def cached_chat_completion(client, model: str, messages: List[Dict[str, Any]], stream: bool = False,
+                           refresh: bool = False, **options) -> Tuple[Union[str, Iterator[str]], int]:
+    """
+    Create a chat completion, reusing the stored response for an identical request
+
+    Args:
+        client: OpenAI client
+        model: Model name
+        messages: Chat messages (image content is keyed by its base64 data)
+        stream: Return an iterator of text chunks (for st.write_stream) instead of a string;
+            a cached response comes back as a single chunk
+        refresh: Skip the stored response and generate a new one, which then
+            replaces it (for a user asking again with the same inputs)
+        **options: Any other chat.completions.create arguments
+
+    Returns:
+        Tuple of (response_text, tokens_saved); tokens_saved is 0 on a cache miss
+    """
+    key = _cache_key(model, messages, options)
+    try:
+        cached = None if refresh else _lookup(key)
+    except (sqlite3.Error, OSError):
+        cached = None
+    if cached is not None:
+        response, tokens = cached
+        _record_saving(tokens)
+        return (iter((response,)) if stream else response), tokens
+
+    if stream:
+        return _stream_and_store(client, key, model, messages, options), 0
+    content, _ = _create_and_store(client, key, model, messages, options)
+    return content, 0
+
+def normalize_ingredients(ingredients: str) -> str:
+    """Lowercase, dedupe and sort a comma-separated list"""
+    items = {item.strip().lower() for item in ingredients.replace('\n', ',').split(',')}
+    return ", ".join(sorted(item for item in items if item))
+
+def _embed(client, text: str) -> "np.ndarray":
+    """Embed text as a unit-length float32 vector, so a dot product is cosine similarity"""
+    # numpy is only needed once a similarity lookup runs, not at app startup
+    import numpy as np
+
+    response = client.embeddings.create(model=_EMBEDDING_MODEL, input=text)
+    vector = np.asarray(response.data[0].embedding, dtype=np.float32)
+    return vector / np.linalg.norm(vector)
+
+def _semantic_lookup(namespace: str, embedding: "np.ndarray") -> Optional[Tuple[str, int]]:
+    """Return (response, tokens) for the closest fresh entry above the threshold, or None"""
+    import numpy as np
+
+    with _db_lock:
+        rows = _get_connection().execute(
+            "SELECT embedding, response, tokens FROM semantic_cache "
+            "WHERE namespace = ? AND created_at > ?",
+            (namespace, time.time() - _CACHE_TTL_SECONDS),
+        ).fetchall()
+    if not rows:
+        return None
+    matrix = np.frombuffer(b"".join(row[0] for row in rows), dtype=np.float32).reshape(len(rows), -1)
+    similarities = matrix @ embedding
+    best = int(np.argmax(similarities))
+    if similarities[best] < SIMILARITY_THRESHOLD:
+        return None
+    return rows[best][1], rows[best][2]
+
+def _semantic_store(namespace: str, embedding: "np.ndarray", response: str, tokens: int):
+    """Save a response under its embedding"""
+    with _db_lock:
+        conn = _get_connection()
+        _prune_expired(conn)
+        conn.execute(
+            "INSERT INTO semantic_cache (namespace, embedding, response, tokens, created_at) "
+            "VALUES (?, ?, ?, ?, ?)",
+            (namespace, embedding.tobytes(), response, tokens, time.time()),
+        )
+        conn.commit()
+
+def similar_chat_completion(client, similar_text: str, request: str, model: str,
+                            messages: List[Dict[str, Any]], stream: bool = False,
+                            recipe_type: str = "", refresh: bool = False, **options) -> Tuple[Union[str, Iterator[str]], int]:
+    """
+    Create a chat completion, reusing a response for a near-identical free-text part
+
+    Only similar_text (an ingredient list) is matched by similarity. The rest
+    of the request (meal type, method, dietary restrictions, allergens, free
+    text instructions) must match exactly, so a cached recipe never ignores a
+    hard constraint. Free text a user may phrase as a constraint ("no pork")
+    must never be passed as similar_text: a negation embeds close to the
+    plain phrase.
+
+    Args:
+        client: OpenAI client
+        similar_text: Comma-separated free text, matched by embedding similarity
+        request: The rest of the user prompt, matched exactly
+        model: Model name
+        messages: Chat messages for the full request
+        stream: Return an iterator of text chunks instead of a string, as in
+            cached_chat_completion
+        recipe_type: Kind of recipe (fridge, photo); responses are only
+            shared within one kind
+        refresh: Skip stored responses and generate a new one, as in
+            cached_chat_completion
+        **options: Any other chat.completions.create arguments
+
+    Returns:
+        Tuple of (response_text, tokens_saved); tokens_saved is 0 on a cache miss
+    """
+    key = _cache_key(model, messages, options)
+    system = messages[0]["content"] if messages[0]["role"] == "system" else ""
+    namespace = hashlib.sha256(orjson.dumps([recipe_type, model, system, request])).hexdigest()
+    try:
+        # An exact hit needs no embedding call
+        cached = None if refresh else _lookup(key)
+        embedding = None
+        if cached is None:
+            embedding = _embed(client, normalize_ingredients(similar_text))
+            if not refresh:
+                cached = _semantic_lookup(namespace, embedding)
+    except Exception:
+        # Embedding or cache trouble: fall back to the exact-match cache
+        return cached_chat_completion(client, model, messages, stream=stream, refresh=refresh, **options)
+    if cached is not None:
+        response, tokens = cached
+        _record_saving(tokens)
+        return (iter((response,)) if stream else response), tokens
+
+    if stream:
+        on_complete = partial(_semantic_store, namespace, embedding)
+        return _stream_and_store(client, key, model, messages, options, on_complete), 0
+    content, tokens = _create_and_store(client, key, model, messages, options)
+    try:
+        _semantic_store(namespace, embedding, content, tokens)
+    except (sqlite3.Error, OSError):
+        pass
+    return content, 0
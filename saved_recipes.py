@@ -6,12 +6,146 @@ Handles saving, loading, and displaying saved recipes with advanced filtering an
 import re
 import streamlit as st
 from datetime import datetime
+from postgrest import CountMethod, ReturnMethod
 from typing import Optional, Dict, Any, List, Tuple
 from utils import (
     generate_recipe_card, create_recipe_card_html, extract_recipe_name,
     generate_shopping_list, generate_recipe_image, upload_image_to_supabase,
 )
 
+# Fields shown after the name in a compact-view expander label
+_LABEL_TAG_FIELDS = ('cuisine', 'meal_type')
+
+# (field, markdown format) pairs for the metadata line on a recipe card
+_CARD_META_FIELDS = (('cuisine', "**{}**"), ('complexity', "*{}*"))
+
+# Columns the saved-recipes list reads. The recipe text is left out: it is
+# fetched separately, only for recipes that are opened or shown as cards
+_RECIPE_COLUMNS = (
+    "id,recipe_name,recipe_type,cuisine,occasion,meal_type,complexity,"
+    "cooking_method,dietary_tags,created_at,is_favorite,rating,user_notes,image_url"
+)
+
+# Columns behind the filter options and the stats line, read for every recipe
+_FACET_COLUMNS = "recipe_type,cuisine,occasion,meal_type,complexity,cooking_method,dietary_tags"
+
+# Recipes loaded per page; "Load more" fetches the next page
+_RECIPES_PAGE_SIZE = 50
+
+# Sort option -> (column, descending) orderings, most significant first
+_SORT_ORDERS = {
+    'Date (Newest First)': (('created_at', True),),
+    'Date (Oldest First)': (('created_at', False),),
+    'Name (A-Z)': (('recipe_name', False),),
+    'Name (Z-A)': (('recipe_name', True),),
+    'Cuisine': (('cuisine', False), ('recipe_name', False)),
+    'Meal Type': (('meal_type', False), ('recipe_name', False)),
+    'Rating (Highest First)': (('rating', True), ('created_at', True)),
+    'Favorites First': (('is_favorite', True), ('recipe_name', False)),
+}
+
+# Complexity has no column order in the database, so that sort loads every
+# matching recipe and orders them here
+_COMPLEXITY_ORDER = {'Easy': 1, 'Medium': 2, 'Hard': 3, 'Show-stopping (Impressive)': 4}
+
+# Optional metadata columns a save leaves empty unless the tab supplies them
+_BASE_ROW = {
+    "cuisine": None,
+    "meal_type": None,
+    "complexity": None,
+    "occasion": None,
+    "cooking_method": None,
+}
+
+def _ilike_pattern(text: str) -> str:
+    """A quoted PostgREST ilike pattern matching text anywhere, safe inside or_()"""
+    escaped = text.replace('\\', '\\\\').replace('"', '\\"')
+    return f'"*{escaped}*"'
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_user_recipes(_client, user_id: str, search: str, cuisines: Tuple[str, ...],
+                        meal_types: Tuple[str, ...], complexity: Tuple[str, ...],
+                        dietary: Tuple[str, ...], cooking_methods: Tuple[str, ...],
+                        favorites_only: bool, sort_by: str,
+                        limit: Optional[int]) -> Tuple[List[Dict], int]:
+    """
+    Fetch one page of a user's recipes, filtered and sorted by the database
+
+    Returns the rows (without recipe_content) and how many recipes match in
+    total. The client is left out of the cache key (leading underscore);
+    results are keyed by user_id and cleared whenever a recipe is saved,
+    updated or deleted.
+    """
+    query = _client.table("saved_recipes").select(_RECIPE_COLUMNS, count=CountMethod.exact).eq(
+        "user_id", user_id
+    )
+    if search:
+        # Searched on the server, so the recipe text never has to be downloaded
+        pattern = _ilike_pattern(search)
+        query = query.or_(f"recipe_name.ilike.{pattern},recipe_content.ilike.{pattern}")
+    for column, values in (('cuisine', cuisines), ('meal_type', meal_types),
+                           ('complexity', complexity), ('cooking_method', cooking_methods)):
+        if values:
+            query = query.in_(column, list(values))
+    if dietary:
+        query = query.ov("dietary_tags", list(dietary))
+    if favorites_only:
+        query = query.eq("is_favorite", True)
+
+    for column, desc in _SORT_ORDERS.get(sort_by, ()):
+        query = query.order(column, desc=desc, nullsfirst=False)
+    if limit and sort_by in _SORT_ORDERS:
+        query = query.range(0, limit - 1)
+
+    response = query.execute()
+    recipes = response.data
+    if sort_by == 'Complexity':
+        recipes.sort(key=lambda r: (_COMPLEXITY_ORDER.get(r.get('complexity') or '', 5), r.get('recipe_name', '')))
+        recipes = recipes[:limit] if limit else recipes
+    return recipes, response.count or len(recipes)
+
+@st.cache_data(ttl=60, show_spinner=False)
+def _fetch_recipe_facets(_client, user_id: str) -> List[Dict]:
+    """Fetch the filterable columns of every recipe a user saved, cached like _fetch_user_recipes"""
+    return _client.table("saved_recipes").select(_FACET_COLUMNS).eq("user_id", user_id).execute().data
+
+@st.cache_data(ttl=300, show_spinner=False)
+def _fetch_recipe_contents(_client, user_id: str, recipe_ids: Tuple[str, ...]) -> Dict[str, str]:
+    """
+    Fetch the text of the given recipes as {id: recipe_content}
+
+    Keyed by user_id as well as the ids, so the process-wide cache never
+    hands one user's recipe to another.
+    """
+    rows = _client.table("saved_recipes").select("id,recipe_content").eq(
+        "user_id", user_id
+    ).in_("id", list(recipe_ids)).execute().data
+    return {str(row["id"]): row["recipe_content"] for row in rows}
+
+def _clear_recipe_caches():
+    """Drop every cached read of saved recipes after a save, update or delete"""
+    # Imported here: meal_planner imports this module
+    from meal_planner import fetch_planned_meals
+
+    _fetch_user_recipes.clear()
+    _fetch_recipe_facets.clear()
+    _fetch_recipe_contents.clear()
+    fetch_saved_recipe_names.clear()
+    # Planned meals join the recipe text, so they go stale too
+    fetch_planned_meals.clear()
+
+@st.cache_data(ttl=300, show_spinner=False)
+def fetch_saved_recipe_names(_client, user_id: str) -> List[Dict]:
+    """
+    Fetch id, name and favorite flag of every recipe a user saved, for pickers
+
+    Favorites come first, then by name. Cached and cleared like
+    _fetch_user_recipes; saves are rare next to reruns.
+    """
+    return _client.table("saved_recipes").select("id, recipe_name, is_favorite").eq(
+        "user_id", user_id
+    ).order("is_favorite", desc=True, nullsfirst=False).order("recipe_name").execute().data
+
 class SavedRecipesManager:
     """Manages saved recipes functionality"""
     
@@ -37,8 +171,7 @@ class SavedRecipesManager:
                 'selected_cooking_methods': [],
                 'sort_by': 'Date (Newest First)'
             }
-        if 'confirm_delete_id' not in st.session_state:
-            st.session_state.confirm_delete_id = None
+        st.session_state.setdefault('confirm_delete_id', None)
     
     def save_recipe(self, recipe_data: Dict[str, Any]) -> bool:
         """
@@ -59,7 +192,11 @@ class SavedRecipesManager:
             if 'created_at' not in recipe_data:
                 recipe_data['created_at'] = datetime.now().isoformat()
             
-            response = self.supabase_client.table("saved_recipes").insert(recipe_data).execute()
+            # Nothing reads the inserted row back, so don't have PostgREST echo the recipe text
+            self.supabase_client.table("saved_recipes").insert(
+                recipe_data, returning=ReturnMethod.minimal
+            ).execute()
+            _clear_recipe_caches()
             return True
         except Exception as e:
             st.error(f"Error saving recipe: {e}")
@@ -81,6 +218,7 @@ class SavedRecipesManager:
         
         try:
             self.supabase_client.table("saved_recipes").delete().eq("id", recipe_id).execute()
+            _clear_recipe_caches()
             return True
         except Exception as e:
             st.error(f"Error deleting recipe: {e}")
@@ -102,6 +240,7 @@ class SavedRecipesManager:
             return False
         try:
             self.supabase_client.table("saved_recipes").update(updates).eq("id", recipe_id).execute()
+            _clear_recipe_caches()
             return True
         except Exception as e:
             st.error(f"Error updating recipe: {e}")
@@ -111,27 +250,63 @@ class SavedRecipesManager:
         """Toggle the is_favorite flag on a saved recipe."""
         return self.update_recipe(recipe_id, {"is_favorite": not current_value})
 
-    def get_user_recipes(self, user_id: str) -> Optional[List[Dict]]:
+    def get_user_recipes(self, user_id: str, filters: Dict[str, Any],
+                         limit: Optional[int] = None) -> Optional[Tuple[List[Dict], int]]:
         """
-        Get all recipes for a specific user
+        Get a page of a user's recipes matching the filters, in the chosen order
         
         Args:
             user_id: The user's ID
+            filters: Search, filter and sort choices (st.session_state.recipe_filters)
+            limit: Maximum number of recipes to load (all if None)
             
         Returns:
-            List of recipe dictionaries or None if error
+            Tuple of (recipes without their content, total number of matches),
+            or None if error
         """
         if not self.supabase_client:
             return None
         
         try:
-            response = self.supabase_client.table("saved_recipes").select("*").eq(
-                "user_id", user_id
-            ).order("created_at", desc=True).execute()
-            return response.data
+            return _fetch_user_recipes(
+                self.supabase_client, user_id,
+                filters['search_query'].strip(),
+                tuple(sorted(filters['selected_cuisines'])),
+                tuple(sorted(filters['selected_meal_types'])),
+                tuple(sorted(filters['selected_complexity'])),
+                tuple(sorted(filters['selected_dietary'])),
+                tuple(sorted(filters['selected_cooking_methods'])),
+                bool(filters.get('favorites_only', False)),
+                filters['sort_by'],
+                limit,
+            )
+        except Exception as e:
+            st.error(f"Error loading recipes: {e}")
+            return None
+
+    def get_recipe_facets(self, user_id: str) -> Optional[List[Dict]]:
+        """Get the filterable columns of all of a user's recipes, for filter options and stats"""
+        if not self.supabase_client:
+            return None
+        try:
+            return _fetch_recipe_facets(self.supabase_client, user_id)
         except Exception as e:
             st.error(f"Error loading recipes: {e}")
             return None
+
+    def with_content(self, recipes: List[Dict]) -> List[Dict]:
+        """Return copies of the recipes with recipe_content filled in, from one query"""
+        if not recipes:
+            return []
+        try:
+            contents = _fetch_recipe_contents(
+                self.supabase_client, st.session_state.user,
+                tuple(str(recipe['id']) for recipe in recipes)
+            )
+        except Exception as e:
+            st.error(f"Error loading recipe text: {e}")
+            contents = {}
+        return [{**recipe, 'recipe_content': contents.get(str(recipe['id']), '')} for recipe in recipes]
     
     def get_unique_values(self, recipes: List[Dict]) -> Dict[str, List]:
         """
@@ -170,91 +345,6 @@ class SavedRecipesManager:
         # Convert sets to sorted lists
         return {k: sorted(list(v)) for k, v in unique_values.items()}
     
-    def filter_recipes(self, recipes: List[Dict]) -> List[Dict]:
-        """
-        Filter recipes based on selected criteria
-        
-        Args:
-            recipes: List of all recipes
-            
-        Returns:
-            Filtered list of recipes
-        """
-        filtered = recipes
-        
-        # Search filter (searches in recipe name and content)
-        search_query = st.session_state.recipe_filters['search_query'].lower()
-        if search_query:
-            filtered = [r for r in filtered if 
-                       search_query in r.get('recipe_name', '').lower() or 
-                       search_query in r.get('recipe_content', '').lower()]
-        
-        # Cuisine filter
-        if st.session_state.recipe_filters['selected_cuisines']:
-            filtered = [r for r in filtered if 
-                       r.get('cuisine') in st.session_state.recipe_filters['selected_cuisines']]
-        
-        # Meal type filter
-        if st.session_state.recipe_filters['selected_meal_types']:
-            filtered = [r for r in filtered if 
-                       r.get('meal_type') in st.session_state.recipe_filters['selected_meal_types']]
-        
-        # Complexity filter
-        if st.session_state.recipe_filters['selected_complexity']:
-            filtered = [r for r in filtered if 
-                       r.get('complexity') in st.session_state.recipe_filters['selected_complexity']]
-        
-        # Dietary tags filter
-        if st.session_state.recipe_filters['selected_dietary']:
-            filtered = [r for r in filtered if 
-                       r.get('dietary_tags') and 
-                       any(tag in r['dietary_tags'] for tag in st.session_state.recipe_filters['selected_dietary'])]
-        
-        # Cooking method filter
-        if st.session_state.recipe_filters['selected_cooking_methods']:
-            filtered = [r for r in filtered if
-                       r.get('cooking_method') in st.session_state.recipe_filters['selected_cooking_methods']]
-
-        # Favorites-only filter
-        if st.session_state.recipe_filters.get('favorites_only', False):
-            filtered = [r for r in filtered if r.get('is_favorite')]
-
-        return filtered
-    
-    def sort_recipes(self, recipes: List[Dict]) -> List[Dict]:
-        """
-        Sort recipes based on selected criteria
-        
-        Args:
-            recipes: List of recipes to sort
-            
-        Returns:
-            Sorted list of recipes
-        """
-        sort_option = st.session_state.recipe_filters['sort_by']
-        
-        if sort_option == 'Date (Newest First)':
-            return sorted(recipes, key=lambda x: x.get('created_at', ''), reverse=True)
-        elif sort_option == 'Date (Oldest First)':
-            return sorted(recipes, key=lambda x: x.get('created_at', ''))
-        elif sort_option == 'Name (A-Z)':
-            return sorted(recipes, key=lambda x: x.get('recipe_name', '').lower())
-        elif sort_option == 'Name (Z-A)':
-            return sorted(recipes, key=lambda x: x.get('recipe_name', '').lower(), reverse=True)
-        elif sort_option == 'Cuisine':
-            return sorted(recipes, key=lambda x: (x.get('cuisine', 'zzz'), x.get('recipe_name', '')))
-        elif sort_option == 'Meal Type':
-            return sorted(recipes, key=lambda x: (x.get('meal_type', 'zzz'), x.get('recipe_name', '')))
-        elif sort_option == 'Complexity':
-            complexity_order = {'Easy': 1, 'Medium': 2, 'Hard': 3, 'Show-stopping (Impressive)': 4}
-            return sorted(recipes, key=lambda x: (complexity_order.get(x.get('complexity', ''), 5), x.get('recipe_name', '')))
-        elif sort_option == 'Rating (Highest First)':
-            return sorted(recipes, key=lambda x: x.get('rating') or 0, reverse=True)
-        elif sort_option == 'Favorites First':
-            return sorted(recipes, key=lambda x: (0 if x.get('is_favorite') else 1, x.get('recipe_name', '')))
-
-        return recipes
-    
     def render_filter_sidebar(self, unique_values: Dict[str, List]):
         """
         Render the filter sidebar
@@ -348,25 +438,25 @@ class SavedRecipesManager:
                 }
                 st.rerun()
     
-    def render_recipe_stats(self, all_recipes: List[Dict], filtered_recipes: List[Dict]):
+    def render_recipe_stats(self, facets: List[Dict], matched: int):
         """
         Render recipe statistics in a compact single line.
 
         Args:
-            all_recipes: All user recipes
-            filtered_recipes: Filtered recipes
+            facets: Filterable columns of all user recipes
+            matched: Number of recipes matching the current filters
         """
         # Count recipes by type
         recipe_types: Dict[str, int] = {}
-        for r in all_recipes:
-            r_type = r.get('recipe_type', 'Unknown')
+        for r in facets:
+            r_type = r.get('recipe_type') or 'Unknown'
             recipe_types[r_type] = recipe_types.get(r_type, 0) + 1
         most_common = max(recipe_types.items(), key=lambda x: x[1])[0].title() if recipe_types else "N/A"
 
-        unique_cuisines = len(set(r.get('cuisine', '') for r in all_recipes if r.get('cuisine')))
+        unique_cuisines = len(set(r.get('cuisine', '') for r in facets if r.get('cuisine')))
 
-        showing_text = f"**{len(filtered_recipes)}** of **{len(all_recipes)}** recipes"
-        if len(filtered_recipes) != len(all_recipes):
+        showing_text = f"**{matched}** of **{len(facets)}** recipes"
+        if matched != len(facets):
             showing_text += " (filtered)"
 
         st.caption(
@@ -381,7 +471,8 @@ class SavedRecipesManager:
         Args:
             recipe_content: The recipe text content
             recipe_type: Type of recipe (cuisine, fridge, photo, occasion)
-            recipe_metadata: Additional metadata about the recipe
+            recipe_metadata: Additional metadata about the recipe; columns it
+                leaves out default to None (see _BASE_ROW)
             button_key: Unique key for the button
             
         Returns:
@@ -393,6 +484,7 @@ class SavedRecipesManager:
                     recipe_name = extract_recipe_name(recipe_content)
                     
                     data = {
+                        **_BASE_ROW,
                         "user_id": st.session_state.user,
                         "recipe_name": recipe_name,
                         "recipe_content": recipe_content,
@@ -426,24 +518,26 @@ class SavedRecipesManager:
             st.info("👈 Use the sidebar to log in or create an account.")
             return
         
-        # Load all recipes
-        all_recipes = self.get_user_recipes(st.session_state.user)
+        # Filter options and stats cover every recipe, from a light query
+        facets = self.get_recipe_facets(st.session_state.user)
         
-        if not all_recipes:
-            st.info("You haven't saved any recipes yet. Generate a recipe and click the 'Save This Recipe' button!")
+        if not facets:
+            if facets is not None:
+                st.info("You haven't saved any recipes yet. Generate a recipe and click the 'Save This Recipe' button!")
             return
         
         # Get unique values for filters
-        unique_values = self.get_unique_values(all_recipes)
+        unique_values = self.get_unique_values(facets)
         
         # Render filter sidebar
         self.render_filter_sidebar(unique_values)
         
-        # Apply filters
-        filtered_recipes = self.filter_recipes(all_recipes)
-        
-        # Apply sorting
-        filtered_recipes = self.sort_recipes(filtered_recipes)
+        # Filtering and sorting happen in the query; only one page is loaded
+        limit = st.session_state.setdefault('saved_recipes_limit', _RECIPES_PAGE_SIZE)
+        result = self.get_user_recipes(st.session_state.user, st.session_state.recipe_filters, limit)
+        if result is None:
+            return
+        filtered_recipes, matched = result
         
         # Display view options and statistics on one line
         col1, col2 = st.columns([3, 1])
@@ -457,7 +551,7 @@ class SavedRecipesManager:
             )
 
         # Compact stats line
-        self.render_recipe_stats(all_recipes, filtered_recipes)
+        self.render_recipe_stats(facets, matched)
 
         # Check if any recipes match filters
         if not filtered_recipes:
@@ -487,6 +581,17 @@ class SavedRecipesManager:
             self._render_compact_view(filtered_recipes)
         else:
             self._render_expanded_view(filtered_recipes)
+
+        self._render_load_more(len(filtered_recipes), matched, limit)
+
+    @staticmethod
+    def _render_load_more(loaded: int, matched: int, limit: int):
+        """Offer the next page of recipes while some matches are not loaded yet"""
+        if loaded < matched:
+            st.caption(f"Showing {loaded} of {matched} matching recipes")
+            if st.button("⬇️ Load more recipes", key="load_more_recipes"):
+                st.session_state.saved_recipes_limit = limit + _RECIPES_PAGE_SIZE
+                st.rerun()
     
     @staticmethod
     def _clean_display_name(name: str, max_len: int = 55) -> str:
@@ -539,11 +644,7 @@ class SavedRecipesManager:
             rating = recipe.get('rating')
             stars = f"  {'⭐' * rating}" if rating else ""
 
-            tags = []
-            if recipe.get('cuisine'):
-                tags.append(recipe['cuisine'])
-            if recipe.get('meal_type'):
-                tags.append(recipe['meal_type'])
+            tags = [value for key in _LABEL_TAG_FIELDS if (value := recipe.get(key))]
             tag_str = f"  —  {' · '.join(tags)}" if tags else ""
 
             date_str = recipe.get('created_at', '')[:10] if recipe.get('created_at') else ''
@@ -551,8 +652,11 @@ class SavedRecipesManager:
 
             label = f"{fav_marker}{display_name}{stars}{tag_str}{date_part}"
 
-            with st.expander(label, expanded=False):
-                self._render_full_recipe_content(recipe, idx)
+            # Rerun on toggle so the recipe text is only fetched once opened
+            expander = st.expander(label, expanded=False, key=f"recipe_exp_{recipe['id']}", on_change="rerun")
+            if expander.open:
+                with expander:
+                    self._render_full_recipe_content(self.with_content([recipe])[0], idx)
     
     @staticmethod
     def _get_recipe_preview(content: str, max_lines: int = 3) -> str:
@@ -598,6 +702,9 @@ class SavedRecipesManager:
             'Main Course': '#6366f1',      # indigo
         }
 
+        # Cards show a preview, so fetch the page's recipe text in one query
+        recipes = self.with_content(recipes)
+
         cols_per_row = 2
         for i in range(0, len(recipes), cols_per_row):
             cols = st.columns(cols_per_row)
@@ -648,11 +755,7 @@ class SavedRecipesManager:
                     st.rerun()
 
             # Metadata line
-            meta_parts = []
-            if recipe.get('cuisine'):
-                meta_parts.append(f"**{recipe['cuisine']}**")
-            if recipe.get('complexity'):
-                meta_parts.append(f"*{recipe['complexity']}*")
+            meta_parts = [fmt.format(value) for key, fmt in _CARD_META_FIELDS if (value := recipe.get(key))]
             rating = recipe.get('rating')
             if rating:
                 meta_parts.append("⭐" * rating)
@@ -660,9 +763,9 @@ class SavedRecipesManager:
                 st.markdown("&nbsp;&nbsp;·&nbsp;&nbsp;".join(meta_parts), unsafe_allow_html=True)
 
             # Dietary tags
-            if recipe.get('dietary_tags') and len(recipe['dietary_tags']) > 0:
-                tag_string = " ".join([f"`{tag}`" for tag in recipe['dietary_tags']])
-                st.markdown(tag_string)
+            dietary_tags = recipe.get('dietary_tags')
+            if dietary_tags:
+                st.markdown(" ".join(f"`{tag}`" for tag in dietary_tags))
 
             # Brief recipe preview
             preview = self._get_recipe_preview(recipe.get('recipe_content', ''))
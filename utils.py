@@ -4,99 +4,157 @@ Contains helper functions for the recipe app
 """
 
 import streamlit as st
+from collections import defaultdict
+from copy import copy
 from datetime import date
-from openai import OpenAI
+from functools import lru_cache
+import json
+import os
 import re
 import requests
-from typing import Tuple, Optional
+from response_cache import cached_chat_completion
+from typing import Iterator, Tuple, Optional
+
+# Holidays and special occasions with date ranges (month, start_day, end_day, name, description)
+_HOLIDAYS = [
+    (1, 1, 1, "New Year's Day", "New Year's celebration recipes"),
+    (1, 13, 20, "Martin Luther King Jr. Day Weekend", "comfort food and soul food"),
+    (2, 1, 14, "Valentine's Day", "romantic dinners and desserts"),
+    (2, 15, 28, "Black History Month", "soul food and African-American cuisine"),
+    (3, 1, 17, "St. Patrick's Day", "Irish-inspired dishes"),
+    (3, 18, 31, "Spring Season", "fresh spring vegetables and lighter dishes"),
+    (4, 1, 30, "Easter Season", "spring brunch and Easter dinner recipes"),
+    (5, 1, 15, "Cinco de Mayo", "Mexican-inspired celebration food"),
+    (5, 20, 31, "Memorial Day Weekend", "BBQ and grilling recipes"),
+    (6, 1, 21, "Father's Day", "hearty grilling and favorite comfort foods"),
+    (6, 22, 30, "Summer Season", "light summer meals and grilling"),
+    (7, 1, 4, "Independence Day", "BBQ, picnic, and patriotic recipes"),
+    (7, 5, 31, "Summer Grilling Season", "outdoor cooking and fresh salads"),
+    (8, 1, 31, "Late Summer", "fresh produce and outdoor dining"),
+    (9, 1, 22, "Labor Day Weekend", "BBQ and end-of-summer gatherings"),
+    (9, 23, 30, "Fall Season", "autumn harvest and comfort food"),
+    (10, 1, 31, "Halloween & Fall Harvest", "pumpkin, apple, and festive fall recipes"),
+    (11, 1, 15, "Thanksgiving Prep", "Thanksgiving sides and preparations"),
+    (11, 16, 30, "Thanksgiving", "traditional Thanksgiving feast recipes"),
+    (12, 1, 24, "Christmas & Holiday Season", "festive holiday meals and cookies"),
+    (12, 25, 31, "Christmas & New Year's", "holiday leftovers and party food"),
+]
+
+# The same holidays bucketed by month, so a lookup only scans that month's entries
+HOLIDAYS_BY_MONTH = defaultdict(list)
+for _month, _start_day, _end_day, _name, _description in _HOLIDAYS:
+    HOLIDAYS_BY_MONTH[_month].append((_start_day, _end_day, _name, _description))
+
+# Intro/filler and metadata phrases that extract_recipe_name skips when
+# looking for a title line, each matched in one case-insensitive regex scan
+_INTRO_PATTERNS = (
+    'here', 'suggest', 'perfect', 'delicious', 'enjoy',
+    'this is', 'try this', 'sure!', 'absolutely', 'great choice',
+    'introduction', 'overview', 'welcome', 'i recommend',
+    'you might', 'you\'ll love', 'let me', 'i\'d suggest',
+)
+_METADATA_PATTERNS = (
+    'servings:', 'prep time:', 'cook time:', 'total time:',
+    'ingredients:', 'instructions:', 'directions:', '---',
+)
+_NUMBERED_LINE_RE = re.compile(r'^\d+[\.\)]\s')
+_INTRO_RE = re.compile('|'.join(map(re.escape, _INTRO_PATTERNS)), re.IGNORECASE)
+_METADATA_RE = re.compile('|'.join(map(re.escape, _METADATA_PATTERNS)), re.IGNORECASE)
+
+# Fallback season for each month, indexed by month number (index 0 unused)
+_WINTER = ("Winter Season", "warming winter comfort foods")
+_SPRING = ("Spring Season", "fresh spring vegetables and lighter dishes")
+_SUMMER = ("Summer Season", "light summer meals and grilling")
+_FALL = ("Fall Season", "autumn harvest and comfort food")
+_SEASONS = (
+    None,
+    _WINTER, _WINTER, _SPRING, _SPRING, _SPRING, _SUMMER,
+    _SUMMER, _SUMMER, _FALL, _FALL, _FALL, _WINTER,
+)
+
+# Markdown patterns used by create_recipe_card_html, compiled once at import
+_BOLD_RE = re.compile(r'\*\*(.+?)\*\*')
+_OL_RE = re.compile(r'^\d+\.\s')
+_OL_STRIP_RE = re.compile(r'^\d+\.\s+')
+
+# Text model for every recipe, card, list and tool call; override with RECIPE_MODEL
+MODEL = os.getenv("RECIPE_MODEL", "gpt-4o-mini")
 
 @st.cache_resource
 def get_openai_client():
     """Get OpenAI client with API key from secrets (cached across reruns)"""
-    return OpenAI(api_key=st.secrets["api_key"])
+    # Imported here so pages that never call the API don't pay for the import
+    import httpx
+    from openai import OpenAI
+    # One keep-alive pool shared by every session, so warm reruns skip the TLS handshake.
+    # max_connections also caps in-flight API calls; extra ones wait for a free slot
+    http_client = httpx.Client(
+        limits=httpx.Limits(max_keepalive_connections=20, max_connections=50),
+        timeout=60
+    )
+    # Rate limits (429), 5xx and dropped connections are retried with exponential
+    # backoff, honouring the API's retry-after header
+    return OpenAI(api_key=st.secrets["api_key"], http_client=http_client, max_retries=5)
+
+# Session state defaults, applied once per key by initialize_session_state
+_SESSION_DEFAULTS = {
+    'identified_ingredients': "",
+    'cuisine_shopping_list': "",
+    'fridge_shopping_list': "",
+    'photo_shopping_list': "",
+    'cuisine_recipe_content': "",
+    'fridge_recipe_content': "",
+    'photo_recipe_content': "",
+    'uploaded_photos': [],
+    'all_identified_ingredients': "",
+    'cuisine_recipe_card': "",
+    'fridge_recipe_card': "",
+    'photo_recipe_card': "",
+    'user': None,
+    'user_email': None,
+    'access_token': None,
+    'refresh_token': None,
+    'show_saved_recipes': False,
+    'occasion_recipe_content': "",
+    'occasion_shopping_list': "",
+    'occasion_recipe_card': "",
+    'surprise_recipe_content': "",
+    'surprise_shopping_list': "",
+    'surprise_recipe_card': "",
+    'photo_analysis_cache': {}  # sha256 of the uploaded photo bytes -> identified ingredients
+}
 
 def initialize_session_state():
     """Initialize all session state variables"""
-    default_states = {
-        'identified_ingredients': "",
-        'cuisine_shopping_list': "",
-        'fridge_shopping_list': "",
-        'photo_shopping_list': "",
-        'cuisine_recipe_content': "",
-        'fridge_recipe_content': "",
-        'photo_recipe_content': "",
-        'uploaded_photos': [],
-        'all_identified_ingredients': "",
-        'cuisine_recipe_card': "",
-        'fridge_recipe_card': "",
-        'photo_recipe_card': "",
-        'user': None,
-        'user_email': None,
-        'access_token': None,
-        'refresh_token': None,
-        'show_saved_recipes': False,
-        'occasion_recipe_content': "",
-        'occasion_shopping_list': "",
-        'occasion_recipe_card': "",
-        'surprise_recipe_content': "",
-        'surprise_shopping_list': "",
-        'surprise_recipe_card': ""
-    }
-    
-    for key, default_value in default_states.items():
-        if key not in st.session_state:
-            st.session_state[key] = default_value
+    for key, default_value in _SESSION_DEFAULTS.items():
+        # Copied so sessions never share a mutable default like a list
+        st.session_state.setdefault(key, copy(default_value))
 
-def get_current_holiday() -> Tuple[str, str]:
+def get_current_holiday(today: Optional[date] = None) -> Tuple[str, str]:
     """
     Determine if there's a current or upcoming holiday/special occasion
     
+    Args:
+        today: The date to check (defaults to today)
+    
     Returns:
         Tuple of (holiday_name, holiday_description)
     """
-    today = date.today()
+    return _holiday_for(today or date.today())
+
+@lru_cache(maxsize=7)
+def _holiday_for(today: date) -> Tuple[str, str]:
+    """Look up the holiday for a date (memoized in-process, so reruns skip the scan)"""
     month = today.month
     day = today.day
     
-    # Define holidays and special occasions with date ranges (month, start_day, end_day, name, description)
-    holidays = [
-        (1, 1, 1, "New Year's Day", "New Year's celebration recipes"),
-        (1, 13, 20, "Martin Luther King Jr. Day Weekend", "comfort food and soul food"),
-        (2, 1, 14, "Valentine's Day", "romantic dinners and desserts"),
-        (2, 15, 28, "Black History Month", "soul food and African-American cuisine"),
-        (3, 1, 17, "St. Patrick's Day", "Irish-inspired dishes"),
-        (3, 18, 31, "Spring Season", "fresh spring vegetables and lighter dishes"),
-        (4, 1, 30, "Easter Season", "spring brunch and Easter dinner recipes"),
-        (5, 1, 15, "Cinco de Mayo", "Mexican-inspired celebration food"),
-        (5, 20, 31, "Memorial Day Weekend", "BBQ and grilling recipes"),
-        (6, 1, 21, "Father's Day", "hearty grilling and favorite comfort foods"),
-        (6, 22, 30, "Summer Season", "light summer meals and grilling"),
-        (7, 1, 4, "Independence Day", "BBQ, picnic, and patriotic recipes"),
-        (7, 5, 31, "Summer Grilling Season", "outdoor cooking and fresh salads"),
-        (8, 1, 31, "Late Summer", "fresh produce and outdoor dining"),
-        (9, 1, 22, "Labor Day Weekend", "BBQ and end-of-summer gatherings"),
-        (9, 23, 30, "Fall Season", "autumn harvest and comfort food"),
-        (10, 1, 31, "Halloween & Fall Harvest", "pumpkin, apple, and festive fall recipes"),
-        (11, 1, 15, "Thanksgiving Prep", "Thanksgiving sides and preparations"),
-        (11, 16, 30, "Thanksgiving", "traditional Thanksgiving feast recipes"),
-        (12, 1, 24, "Christmas & Holiday Season", "festive holiday meals and cookies"),
-        (12, 25, 31, "Christmas & New Year's", "holiday leftovers and party food"),
-    ]
-    
     # Check if today falls within any holiday period
-    for hol_month, start_day, end_day, holiday_name, description in holidays:
-        if month == hol_month and start_day <= day <= end_day:
+    for start_day, end_day, holiday_name, description in HOLIDAYS_BY_MONTH[month]:
+        if start_day <= day <= end_day:
             return holiday_name, description
     
     # Default seasonal return
-    if month in [12, 1, 2]:
-        return "Winter Season", "warming winter comfort foods"
-    elif month in [3, 4, 5]:
-        return "Spring Season", "fresh spring vegetables and lighter dishes"
-    elif month in [6, 7, 8]:
-        return "Summer Season", "light summer meals and grilling"
-    else:
-        return "Fall Season", "autumn harvest and comfort food"
+    return _SEASONS[month]
 
 def extract_recipe_name(recipe_content: str) -> str:
     """
@@ -156,52 +214,40 @@ def extract_recipe_name(recipe_content: str) -> str:
                 if 3 <= len(name) <= 80 and not _is_section_header(name):
                     return name
 
-    # Pass 4: First meaningful line that looks like a title
-    intro_patterns = [
-        'here', 'suggest', 'perfect', 'delicious', 'enjoy',
-        'this is', 'try this', 'sure!', 'absolutely', 'great choice',
-        'introduction', 'overview', 'welcome', 'i recommend',
-        'you might', 'you\'ll love', 'let me', 'i\'d suggest',
-    ]
+    # Pass 4: First meaningful line that looks like a title. The same scan
+    # remembers the first fallback candidate, so no second pass is needed
+    fallback = None
     for line in lines:
         stripped = line.strip()
         if not stripped:
             continue
-        lower = stripped.lower()
+
+        # Clean markdown formatting
+        clean = stripped.replace('#', '').replace('*', '').strip().rstrip(':').strip()
+
+        # Fallback candidate — skip intro/filler lines even here
+        if (fallback is None and len(clean) > 3
+                and not _INTRO_RE.search(clean) and not _is_section_header(clean)):
+            fallback = clean[:80]
 
         # Skip intro/filler lines
-        if any(p in lower for p in intro_patterns):
+        if _INTRO_RE.search(stripped):
             continue
         # Skip metadata lines
-        if any(p in lower for p in [
-            'servings:', 'prep time:', 'cook time:', 'total time:',
-            'ingredients:', 'instructions:', 'directions:', '---',
-        ]):
+        if _METADATA_RE.search(stripped):
             continue
         # Skip list items (ingredients / bullet points)
-        if stripped.startswith('-') or stripped.startswith('•'):
+        if stripped.startswith(('-', '•')):
             continue
         # Skip numbered instruction lines
-        if re.match(r'^\d+[\.\)]\s', stripped):
+        if _NUMBERED_LINE_RE.match(stripped):
             continue
 
-        # Clean markdown formatting
-        clean = stripped.replace('#', '').replace('*', '').strip().rstrip(':').strip()
-
         if 3 <= len(clean) <= 80:
             return clean
 
-    # Fallback — skip intro/filler lines even here
-    for line in lines:
-        clean = line.strip().replace('#', '').replace('*', '').strip().rstrip(':').strip()
-        if not clean or len(clean) <= 3:
-            continue
-        lower = clean.lower()
-        if any(p in lower for p in intro_patterns):
-            continue
-        if _is_section_header(clean):
-            continue
-        return clean[:80]
+    if fallback:
+        return fallback
 
     return "Untitled Recipe"
 
@@ -216,53 +262,137 @@ def generate_shopping_list(recipe_text: str, available_ingredients: str = "") ->
     Returns:
         str: Formatted shopping list
     """
+    try:
+        return _cached_shopping_list(recipe_text, available_ingredients)
+    except Exception as e:
+        return f"Error generating shopping list: {e}"
+
+# Prompt templates, kept flush-left so no indentation is sent as prompt tokens
+_SHOPPING_LIST_TEMPLATE = """\
+{have_line}Create a shopping list by:
+1. Extracting every ingredient from the recipe with its quantity
+2. {step_two}
+3. Grouping items by grocery store section
+
+Format as:
+**SHOPPING LIST**
+
+**Produce:**
+- item (quantity)
+
+**Meat/Seafood:**
+- item (quantity)
+
+**Dairy:**
+- item (quantity)
+
+**Pantry/Dry Goods:**
+- item (quantity)
+
+**Other:**
+- item (quantity)
+{have_section}
+Only include items that need to be purchased, with quantities where the recipe gives them."""
+
+def _shopping_list_instructions(available_ingredients: str) -> str:
+    """Build the shopping list instructions that follow the recipe in a prompt"""
+    if available_ingredients:
+        return _SHOPPING_LIST_TEMPLATE.format(
+            have_line=f"Ingredients I already have: {available_ingredients}\n\n",
+            step_two="Separating what I already have from what I need to buy",
+            have_section="\n**✅ Items you already have:**\n- (items from my ingredients that the recipe uses)\n",
+        )
+    return _SHOPPING_LIST_TEMPLATE.format(
+        have_line="", step_two="Listing all ingredients I need to buy", have_section=""
+    )
+
+def _shopping_list_prompt(recipe_text: str, available_ingredients: str) -> str:
+    """Build the full shopping list prompt for a recipe"""
+    return f"Based on this recipe: {recipe_text}\n\n{_shopping_list_instructions(available_ingredients)}"
+
+_SHOPPING_LIST_SYSTEM = "You are a helpful shopping assistant who creates organized grocery lists from recipes."
+
+_RECIPE_CARD_INSTRUCTIONS = """\
+Create a print-friendly recipe card with this structure:
+
+# [Recipe Name]
+
+**Servings:** [number]  |  **Prep Time:** [time]  |  **Cook Time:** [time]  |  **Total Time:** [time]
+
+---
+
+## Ingredients
+
+- [ingredient with quantity]
+
+---
+
+## Instructions
+
+1. [First step]
+2. [Second step]
+
+---
+
+## Tips & Notes
+
+[Helpful tips, substitutions, or storage information]
+
+---
+
+**Recipe generated by Dinner Recipe Maker**
+
+Number the steps 1. 2. 3. (never "1." for every step). No blank lines between list items.
+Estimate any prep/cook times the recipe doesn't give."""
+
+_RECIPE_CARD_SYSTEM = "You are a helpful assistant who creates beautifully formatted, print-friendly recipe cards in markdown."
+
+def _cached_shopping_list(recipe_text: str, available_ingredients: str) -> str:
+    """
+    Call the model for generate_shopping_list through the response cache,
+    which stream_shopping_list shares; errors propagate so they are never cached
+    """
+    content, _ = cached_chat_completion(
+        get_openai_client(),
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": _SHOPPING_LIST_SYSTEM},
+            {"role": "user", "content": _shopping_list_prompt(recipe_text, available_ingredients)}
+        ],
+        max_tokens=800,
+        temperature=0.7
+    )
+    return content
+
+def stream_shopping_list(recipe_text: str, available_ingredients: str = "") -> Iterator[str]:
+    """
+    Stream a shopping list from a recipe as it is generated, for st.write_stream
+    
+    Args:
+        recipe_text: The recipe content
+        available_ingredients: Ingredients the user already has
+        
+    Yields:
+        str: Successive chunks of the formatted shopping list
+    """
     client = get_openai_client()
     
     try:
-        prompt = f"""
-        Based on this recipe: {recipe_text}
-        
-        {"And these ingredients I already have: " + available_ingredients if available_ingredients else ""}
-        
-        Please create a smart shopping list by:
-        1. Extracting all ingredients from the recipe with quantities
-        2. {"Separating what I already have vs. what I need to buy" if available_ingredients else "Listing all ingredients I need to buy"}
-        3. Organizing by grocery store sections (Produce, Meat/Seafood, Dairy, Pantry, etc.)
-        4. Including estimated quantities where specified in the recipe
-        
-        Format as:
-        **SHOPPING LIST**
-        
-        **Produce:**
-        - item (quantity)
-        
-        **Meat/Seafood:**
-        - item (quantity)
-        
-        **Dairy:**
-        - item (quantity)
-        
-        **Pantry/Dry Goods:**
-        - item (quantity)
-        
-        **Other:**
-        - item (quantity)
-        
-        {"**✅ Items you already have:**" + chr(10) + "- (list items from available ingredients that are used in recipe)" if available_ingredients else ""}
-        
-        Only include items that need to be purchased. Be specific about quantities when mentioned in the recipe.
-        """
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
+        # Re-clicking for an unchanged recipe replays the stored list as one chunk
+        chunks, _ = cached_chat_completion(
+            client,
+            model=MODEL,
             messages=[
-                {"role": "system", "content": "You are a helpful shopping assistant who creates organized grocery lists from recipes."},
-                {"role": "user", "content": prompt}
-            ]
+                {"role": "system", "content": _SHOPPING_LIST_SYSTEM},
+                {"role": "user", "content": _shopping_list_prompt(recipe_text, available_ingredients)}
+            ],
+            stream=True,
+            max_tokens=800,
+            temperature=0.7
         )
-        return response.choices[0].message.content
+        yield from chunks
     except Exception as e:
-        return f"Error generating shopping list: {e}"
+        yield f"Error generating shopping list: {e}"
 
 def generate_recipe_card(recipe_text: str) -> str:
     """
@@ -274,59 +404,145 @@ def generate_recipe_card(recipe_text: str) -> str:
     Returns:
         str: Formatted recipe card in markdown
     """
-    client = get_openai_client()
-    
     try:
-        prompt = f"""
-        Based on this recipe: {recipe_text}
-        
-        Please create a beautifully formatted, print-friendly recipe card with the following structure:
-        
-        # [Recipe Name]
-        
-        **Servings:** [number]  |  **Prep Time:** [time]  |  **Cook Time:** [time]  |  **Total Time:** [time]
-        
-        ---
-        
-        ## Ingredients
-        
-        [List all ingredients with quantities, formatted clearly with bullet points using "- "]
-        
-        ---
-        
-        ## Instructions
-        
-        [IMPORTANT: Number the steps sequentially as 1. 2. 3. 4. etc. NOT as 1. 1. 1. 1.]
-        [Each step should be clear and concise]
-        [Use actual sequential numbers: 1. First step, 2. Second step, 3. Third step, etc.]
-        
-        ---
-        
-        ## Tips & Notes
-        
-        [Any helpful tips, substitutions, or storage information]
-        
-        ---
-        
-        **Recipe generated by Dinner Recipe Maker**
-        
-        Please format this in a clean, organized way that would look great when printed. 
-        CRITICAL: Use sequential numbering for instructions (1. 2. 3. 4. etc.), not repeated "1." for every step.
-        Use clear markdown formatting with no extra blank lines between list items.
-        If prep/cook times aren't specified in the original recipe, estimate reasonable times based on the recipe complexity.
-        """
-        
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful assistant who creates beautifully formatted, print-friendly recipe cards. Always use sequential numbering (1. 2. 3. 4.) for instructions, never repeat '1.' for each step."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
+        return _cached_recipe_card(recipe_text)
     except Exception as e:
         return f"Error generating recipe card: {e}"
 
+def _cached_recipe_card(recipe_text: str) -> str:
+    """Call the model for generate_recipe_card through the response cache; errors propagate so they are never cached"""
+    prompt = f"Based on this recipe: {recipe_text}\n\n{_RECIPE_CARD_INSTRUCTIONS}"
+
+    content, _ = cached_chat_completion(
+        get_openai_client(),
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": _RECIPE_CARD_SYSTEM},
+            {"role": "user", "content": prompt}
+        ],
+        max_tokens=1200,
+        temperature=0.7
+    )
+    return content
+
+def generate_card_and_list(recipe_text: str, available_ingredients: str = "") -> Tuple[str, str]:
+    """
+    Generate the recipe card and shopping list for a recipe in a single request
+    
+    Args:
+        recipe_text: The recipe content
+        available_ingredients: Ingredients the user already has
+        
+    Returns:
+        Tuple of (recipe_card, shopping_list), formatted as by generate_recipe_card
+        and generate_shopping_list
+    """
+    try:
+        return _cached_card_and_list(recipe_text, available_ingredients)
+    except Exception as e:
+        return f"Error generating recipe card: {e}", f"Error generating shopping list: {e}"
+
+def _cached_card_and_list(recipe_text: str, available_ingredients: str) -> Tuple[str, str]:
+    """Call the model for generate_card_and_list through the response cache; errors propagate so they are never cached"""
+    prompt = (
+        f"Based on this recipe: {recipe_text}\n\n"
+        'Complete both tasks below. Reply with a JSON object whose string fields are '
+        '"card" (the markdown for TASK 1) and "shopping_list" (the markdown for TASK 2).\n\n'
+        f"TASK 1 (card):\n{_RECIPE_CARD_INSTRUCTIONS}\n\n"
+        f"TASK 2 (shopping_list):\n{_shopping_list_instructions(available_ingredients)}"
+    )
+
+    messages = [
+        {"role": "system", "content": f"{_RECIPE_CARD_SYSTEM} {_SHOPPING_LIST_SYSTEM} You always reply with valid JSON."},
+        {"role": "user", "content": prompt}
+    ]
+    options = {"max_tokens": 2000, "temperature": 0.7, "response_format": {"type": "json_object"}}
+    content, _ = cached_chat_completion(get_openai_client(), model=MODEL, messages=messages, **options)
+    try:
+        result = json.loads(content)
+        return result["card"], result["shopping_list"]
+    except (ValueError, KeyError):
+        # A cut-off or malformed reply was stored; replace it with a fresh one
+        content, _ = cached_chat_completion(get_openai_client(), model=MODEL, messages=messages,
+                                            refresh=True, **options)
+        result = json.loads(content)
+        return result["card"], result["shopping_list"]
+
+def submit_card_and_list_batch(recipe_text: str, available_ingredients: str = "") -> str:
+    """
+    Queue the recipe card and shopping list on the OpenAI Batch API
+
+    Batch requests cost half as much but can take up to 24 hours; collect
+    the results with fetch_card_and_list_batch.
+
+    Args:
+        recipe_text: The recipe content
+        available_ingredients: Ingredients the user already has
+
+    Returns:
+        str: The batch ID
+    """
+    client = get_openai_client()
+
+    requests_by_id = {
+        "card": {
+            "model": MODEL,
+            "max_tokens": 1200,
+            "temperature": 0.7,
+            "messages": [
+                {"role": "system", "content": _RECIPE_CARD_SYSTEM},
+                {"role": "user", "content": f"Based on this recipe: {recipe_text}\n\n{_RECIPE_CARD_INSTRUCTIONS}"}
+            ]
+        },
+        "shopping_list": {
+            "model": MODEL,
+            "max_tokens": 800,
+            "temperature": 0.7,
+            "messages": [
+                {"role": "system", "content": _SHOPPING_LIST_SYSTEM},
+                {"role": "user", "content": _shopping_list_prompt(recipe_text, available_ingredients)}
+            ]
+        }
+    }
+    lines = [
+        json.dumps({"custom_id": custom_id, "method": "POST", "url": "/v1/chat/completions", "body": body})
+        for custom_id, body in requests_by_id.items()
+    ]
+    batch_file = client.files.create(file=("card_and_list.jsonl", "\n".join(lines).encode()), purpose="batch")
+    batch = client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    return batch.id
+
+def fetch_card_and_list_batch(batch_id: str) -> Optional[Tuple[str, str]]:
+    """
+    Collect the results of submit_card_and_list_batch
+
+    Args:
+        batch_id: The batch ID
+
+    Returns:
+        Tuple of (recipe_card, shopping_list), or None while the batch is still running
+
+    Raises:
+        RuntimeError: If the batch failed, expired or was cancelled
+    """
+    client = get_openai_client()
+
+    batch = client.batches.retrieve(batch_id)
+    if batch.status in ("failed", "expired", "cancelled"):
+        raise RuntimeError(f"batch {batch.status}")
+    if batch.status != "completed":
+        return None
+
+    results = {}
+    for line in client.files.content(batch.output_file_id).text.splitlines():
+        item = json.loads(line)
+        results[item["custom_id"]] = item["response"]["body"]["choices"][0]["message"]["content"]
+    return results["card"], results["shopping_list"]
+
 def generate_weekly_shopping_list(combined_recipe_text: str) -> str:
     """
     Generate a combined shopping list from multiple recipes for a week's meal plan.
@@ -337,57 +553,178 @@ def generate_weekly_shopping_list(combined_recipe_text: str) -> str:
     Returns:
         str: Formatted combined shopping list with deduplication
     """
-    client = get_openai_client()
-
     try:
-        prompt = f"""
-        I have the following recipes planned for the week:
+        return _cached_weekly_shopping_list(combined_recipe_text)
+    except Exception as e:
+        return f"Error generating weekly shopping list: {e}"
 
-        {combined_recipe_text}
+def _cached_weekly_shopping_list(combined_recipe_text: str) -> str:
+    """Call the model for generate_weekly_shopping_list through the response cache; errors propagate so they are never cached"""
 
-        Please create a COMBINED, DEDUPLICATED shopping list by:
-        1. Extracting all ingredients from ALL recipes above
-        2. Combining duplicate ingredients and summing their quantities
-           (e.g., if two recipes need 1 cup of rice each, list "Rice (2 cups)")
-        3. Organizing by grocery store sections (Produce, Meat/Seafood, Dairy, Pantry, etc.)
-        4. Noting which recipe(s) each ingredient is used in
+    prompt = f"""
+    I have the following recipes planned for the week:
 
-        Format as:
-        **WEEKLY SHOPPING LIST**
+    {combined_recipe_text}
 
-        **Produce:**
-        - item (total quantity) - used in: Recipe A, Recipe B
+    Please create a COMBINED, DEDUPLICATED shopping list by:
+    1. Extracting all ingredients from ALL recipes above
+    2. Combining duplicate ingredients and summing their quantities
+       (e.g., if two recipes need 1 cup of rice each, list "Rice (2 cups)").
+       A recipe marked x2 or more is cooked that many times, so multiply its quantities
+    3. Organizing by grocery store sections (Produce, Meat/Seafood, Dairy, Pantry, etc.)
+    4. Noting which recipe(s) each ingredient is used in
 
-        **Meat/Seafood:**
-        - item (total quantity) - used in: Recipe A
+    Format as:
+    **WEEKLY SHOPPING LIST**
 
-        **Dairy:**
-        - item (total quantity) - used in: Recipe B
+    **Produce:**
+    - item (total quantity) - used in: Recipe A, Recipe B
 
-        **Pantry/Dry Goods:**
-        - item (total quantity) - used in: Recipe A, Recipe C
+    **Meat/Seafood:**
+    - item (total quantity) - used in: Recipe A
 
-        **Other:**
-        - item (total quantity) - used in: Recipe B
+    **Dairy:**
+    - item (total quantity) - used in: Recipe B
 
-        Be smart about combining similar items. Skip very common pantry staples
-        like salt, pepper, and cooking oil unless large quantities are needed.
-        """
+    **Pantry/Dry Goods:**
+    - item (total quantity) - used in: Recipe A, Recipe C
 
-        response = client.chat.completions.create(
-            model="gpt-4o-mini",
-            messages=[
-                {"role": "system", "content": "You are a helpful shopping assistant who creates organized, deduplicated grocery lists from multiple recipes for weekly meal planning."},
-                {"role": "user", "content": prompt}
-            ]
-        )
-        return response.choices[0].message.content
-    except Exception as e:
-        return f"Error generating weekly shopping list: {e}"
+    **Other:**
+    - item (total quantity) - used in: Recipe B
+
+    Be smart about combining similar items. Skip very common pantry staples
+    like salt, pepper, and cooking oil unless large quantities are needed.
+    """
+
+    content, _ = cached_chat_completion(
+        get_openai_client(),
+        model=MODEL,
+        messages=[
+            {"role": "system", "content": "You are a helpful shopping assistant who creates organized, deduplicated grocery lists from multiple recipes for weekly meal planning."},
+            {"role": "user", "content": prompt}
+        ]
+    )
+    return content
+
+_RECIPE_CARD_PAGE = """\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="UTF-8">
+    <title>Recipe Card</title>
+    <style>
+        @media print {
+            body { margin: 1in; }
+            button { display: none; }
+        }
+        body {
+            font-family: 'Georgia', serif;
+            max-width: 800px;
+            margin: 40px auto;
+            padding: 20px;
+            line-height: 1.6;
+            color: #333;
+        }
+        h1 {
+            color: #2c5530;
+            border-bottom: 3px solid #2c5530;
+            padding-bottom: 10px;
+            margin-bottom: 20px;
+        }
+        h2 {
+            color: #5a7d5e;
+            margin-top: 30px;
+            margin-bottom: 15px;
+            font-size: 1.4em;
+        }
+        hr {
+            border: none;
+            border-top: 1px solid #ddd;
+            margin: 20px 0;
+        }
+        ul {
+            margin-left: 20px;
+            margin-bottom: 20px;
+            padding-left: 20px;
+        }
+        ol {
+            margin-left: 20px;
+            margin-bottom: 20px;
+            padding-left: 20px;
+        }
+        ul li {
+            margin-bottom: 8px;
+            list-style-type: disc;
+        }
+        ol li {
+            margin-bottom: 10px;
+            list-style-type: decimal;
+        }
+        strong {
+            color: #2c5530;
+        }
+        p {
+            margin: 8px 0;
+        }
+        .print-button {
+            background-color: #2c5530;
+            color: white;
+            padding: 12px 24px;
+            border: none;
+            border-radius: 5px;
+            cursor: pointer;
+            font-size: 16px;
+            margin: 20px 0;
+            display: block;
+        }
+        .print-button:hover {
+            background-color: #1e3d22;
+        }
+        @page {
+            margin: 1in;
+        }
+    </style>
+</head>
+<body>
+    <button class="print-button" onclick="window.print()">🖨️ Print Recipe Card</button>
+{% for block in blocks %}
+{%- if block.tag in ("ul", "ol") %}
+    <{{ block.tag }}>
+    {%- for item in block["items"] %}
+        <li>{{ item|bold }}</li>
+    {%- endfor %}
+    </{{ block.tag }}>
+{%- elif block.tag == "hr" %}
+    <hr>
+{%- elif block.tag == "p" %}
+    <p>{{ block.text|bold }}</p>
+{%- else %}
+    <{{ block.tag }}>{{ block.text }}</{{ block.tag }}>
+{%- endif %}
+{% endfor %}
+    <button class="print-button" onclick="window.print()">🖨️ Print Recipe Card</button>
+</body>
+</html>
+"""
 
+@st.cache_resource
+def _recipe_card_template():
+    """Compile the recipe card page once per process; text is HTML-escaped on render"""
+    # Imported here so pages that never print a card don't pay for the import
+    from jinja2 import Environment
+    from markupsafe import Markup, escape
+
+    env = Environment(autoescape=True)
+    # **bold** -> <strong>, applied after escaping so model output can't inject markup
+    env.filters["bold"] = lambda text: Markup(_BOLD_RE.sub(r'<strong>\1</strong>', str(escape(text))))
+    return env.from_string(_RECIPE_CARD_PAGE)
+
+@st.cache_data(max_entries=64, show_spinner=False)
 def create_recipe_card_html(recipe_card_content: str) -> str:
     """
     Convert markdown recipe card to HTML for printing
+
+    Cached by card text, since the download button re-renders it on every rerun
     
     Args:
         recipe_card_content: Markdown formatted recipe card
@@ -395,185 +732,45 @@ def create_recipe_card_html(recipe_card_content: str) -> str:
     Returns:
         str: Complete HTML document for printing
     """
-    lines = recipe_card_content.split('\n')
-    html_lines = []
-    in_unordered_list = False
-    in_ordered_list = False
-    
-    for line in lines:
+    blocks = []
+    current_list = None  # The 'ul' or 'ol' block being filled, if any
+
+    for line in recipe_card_content.split('\n'):
         stripped = line.strip()
         
         # Skip empty lines that would create extra spacing
         if not stripped:
-            if in_unordered_list:
-                html_lines.append('</ul>')
-                in_unordered_list = False
-            if in_ordered_list:
-                html_lines.append('</ol>')
-                in_ordered_list = False
+            current_list = None
+            continue
+        
+        # Handle unordered (bullet) and ordered (numbered) list items
+        if stripped.startswith('- '):
+            tag, item = 'ul', stripped[2:]
+        elif _OL_RE.match(stripped):
+            tag, item = 'ol', _OL_STRIP_RE.sub('', stripped)
+        else:
+            tag = None
+        if tag:
+            if current_list is None or current_list["tag"] != tag:
+                current_list = {"tag": tag, "items": []}
+                blocks.append(current_list)
+            current_list["items"].append(item)
             continue
         
-        # Handle headers
+        # Anything else ends the current list
+        current_list = None
+        
+        # Handle headers, horizontal rules and regular text
         if stripped.startswith('# '):
-            if in_unordered_list:
-                html_lines.append('</ul>')
-                in_unordered_list = False
-            if in_ordered_list:
-                html_lines.append('</ol>')
-                in_ordered_list = False
-            html_lines.append(f'<h1>{stripped[2:]}</h1>')
+            blocks.append({"tag": "h1", "text": stripped[2:]})
         elif stripped.startswith('## '):
-            if in_unordered_list:
-                html_lines.append('</ul>')
-                in_unordered_list = False
-            if in_ordered_list:
-                html_lines.append('</ol>')
-                in_ordered_list = False
-            html_lines.append(f'<h2>{stripped[3:]}</h2>')
-        
-        # Handle horizontal rules
+            blocks.append({"tag": "h2", "text": stripped[3:]})
         elif stripped == '---':
-            if in_unordered_list:
-                html_lines.append('</ul>')
-                in_unordered_list = False
-            if in_ordered_list:
-                html_lines.append('</ol>')
-                in_ordered_list = False
-            html_lines.append('<hr>')
-        
-        # Handle unordered list items (bullet points)
-        elif stripped.startswith('- '):
-            if in_ordered_list:
-                html_lines.append('</ol>')
-                in_ordered_list = False
-            if not in_unordered_list:
-                html_lines.append('<ul>')
-                in_unordered_list = True
-            # Convert bold text within list items
-            item_text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', stripped[2:])
-            html_lines.append(f'<li>{item_text}</li>')
-        
-        # Handle ordered list items (numbered)
-        elif re.match(r'^\d+\.\s', stripped):
-            if in_unordered_list:
-                html_lines.append('</ul>')
-                in_unordered_list = False
-            if not in_ordered_list:
-                html_lines.append('<ol>')
-                in_ordered_list = True
-            # Extract the text after the number and period
-            item_text = re.sub(r'^\d+\.\s+', '', stripped)
-            # Convert bold text within list items
-            item_text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', item_text)
-            html_lines.append(f'<li>{item_text}</li>')
-        
-        # Handle regular text
+            blocks.append({"tag": "hr"})
         else:
-            if in_unordered_list:
-                html_lines.append('</ul>')
-                in_unordered_list = False
-            if in_ordered_list:
-                html_lines.append('</ol>')
-                in_ordered_list = False
-            # Convert bold text
-            text = re.sub(r'\*\*(.+?)\*\*', r'<strong>\1</strong>', stripped)
-            html_lines.append(f'<p>{text}</p>')
-    
-    # Close any remaining lists
-    if in_unordered_list:
-        html_lines.append('</ul>')
-    if in_ordered_list:
-        html_lines.append('</ol>')
-    
-    html_content = '\n'.join(html_lines)
+            blocks.append({"tag": "p", "text": stripped})
     
-    full_html = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <title>Recipe Card</title>
-        <style>
-            @media print {{
-                body {{ margin: 1in; }}
-                button {{ display: none; }}
-            }}
-            body {{
-                font-family: 'Georgia', serif;
-                max-width: 800px;
-                margin: 40px auto;
-                padding: 20px;
-                line-height: 1.6;
-                color: #333;
-            }}
-            h1 {{
-                color: #2c5530;
-                border-bottom: 3px solid #2c5530;
-                padding-bottom: 10px;
-                margin-bottom: 20px;
-            }}
-            h2 {{
-                color: #5a7d5e;
-                margin-top: 30px;
-                margin-bottom: 15px;
-                font-size: 1.4em;
-            }}
-            hr {{
-                border: none;
-                border-top: 1px solid #ddd;
-                margin: 20px 0;
-            }}
-            ul {{
-                margin-left: 20px;
-                margin-bottom: 20px;
-                padding-left: 20px;
-            }}
-            ol {{
-                margin-left: 20px;
-                margin-bottom: 20px;
-                padding-left: 20px;
-            }}
-            ul li {{
-                margin-bottom: 8px;
-                list-style-type: disc;
-            }}
-            ol li {{
-                margin-bottom: 10px;
-                list-style-type: decimal;
-            }}
-            strong {{
-                color: #2c5530;
-            }}
-            p {{
-                margin: 8px 0;
-            }}
-            .print-button {{
-                background-color: #2c5530;
-                color: white;
-                padding: 12px 24px;
-                border: none;
-                border-radius: 5px;
-                cursor: pointer;
-                font-size: 16px;
-                margin: 20px 0;
-                display: block;
-            }}
-            .print-button:hover {{
-                background-color: #1e3d22;
-            }}
-            @page {{
-                margin: 1in;
-            }}
-        </style>
-    </head>
-    <body>
-        <button class="print-button" onclick="window.print()">🖨️ Print Recipe Card</button>
-        {html_content}
-        <button class="print-button" onclick="window.print()">🖨️ Print Recipe Card</button>
-    </body>
-    </html>
-    """
-    return full_html
+    return _recipe_card_template().render(blocks=blocks)
 
 
 def generate_nutritional_info(recipe_text: str) -> str:
@@ -604,7 +801,7 @@ Format as:
 Note: These are rough estimates based on typical ingredient quantities."""
 
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MODEL,
             messages=[
                 {"role": "system", "content": "You are a nutritionist who provides estimated nutritional information for recipes. Give reasonable estimates based on typical serving sizes and ingredient quantities."},
                 {"role": "user", "content": prompt}
@@ -641,7 +838,7 @@ What are good substitutions for "{ingredient}"? Consider:
 List 3-5 practical options."""
 
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful chef who suggests ingredient substitutions. Be practical and consider flavor, texture, and cooking properties."},
                 {"role": "user", "content": prompt}
@@ -673,7 +870,7 @@ Original recipe:
 Adjust ALL ingredient quantities proportionally. Keep the instructions the same but update any references to quantities. Format the complete rescaled recipe with adjusted ingredients and instructions."""
 
         response = client.chat.completions.create(
-            model="gpt-4o-mini",
+            model=MODEL,
             messages=[
                 {"role": "system", "content": "You are a helpful chef who rescales recipes accurately. Always show the complete rescaled recipe with adjusted quantities."},
                 {"role": "user", "content": prompt}